@@ -3,20 +3,52 @@ eventlet.monkey_patch()
 
 from flask import Flask
 import os
-from flask_socketio import SocketIO
 from flask_cors import CORS
 from config.config import Config
-from database.db import db
-
-socketio = SocketIO()
+from database.db import db, configure_engine
+from extensions import socketio
+from utils.profile_cache import init_profile_cache
+from utils.presence import init_presence
+from utils.last_seen import init_last_seen
+from database.ingest import init_ingest
+from sockets.group_fanout import init_group_fanout
+from utils.serializers import init_json
+from database.search import init_search
+from utils.media_previews import init_media_previews
+from utils.token import init_tokens
+from utils.auth import init_auth
+from utils.passwords import init_passwords
+from utils.usernames import init_usernames
+from utils.push import init_push
+from database.devices import init_devices
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
+    init_json(app)
+    init_tokens(app)
+    init_auth(app)
+    init_passwords(app)
+    init_usernames(app)
     CORS(app)
     db.init_app(app)
-    socketio.init_app(app, cors_allowed_origins="*")
+    configure_engine(app)
+    init_profile_cache(app)
+    init_presence(app)
+    init_last_seen(app)
+    init_ingest(app)
+    init_group_fanout(app)
+    init_media_previews(app)
+    init_push(app)
+    init_devices(app)
+    # With a message queue, emits from any worker (or REST handler) reach sockets held by the others
+    socketio.init_app(
+        app,
+        cors_allowed_origins="*",
+        message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE'),
+        channel=app.config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+    )
 
     # Import routes
     from routes.auth import auth_bp
@@ -33,6 +65,7 @@ def create_app():
 
     with app.app_context():
         db.create_all()
+        init_search(app)
 
     # Import sockets events
     from sockets import chat_socket
@@ -0,0 +1,62 @@
+from app import app # first: monkey-patches eventlet and builds the one app instance
+from sqlalchemy import func
+from database.db import db
+from database.models import Conversation, GroupMember, Message
+
+# One-off backfill of the materialized inbox (conversation rows) from existing messages, for
+# databases that had messages before the table existed. Run migrate_conversation_keys.py first.
+# Rows that already exist are left alone, so it is safe to run more than once.
+BATCH_SIZE = 1000
+
+def backfill(app):
+    with app.app_context():
+        latest_ids = db.session.query(
+            Message.conversation_key, func.max(Message.id).label('last_id')
+        ).filter(Message.conversation_key != None).group_by(Message.conversation_key).subquery()
+        latest = db.session.query(
+            Message.conversation_key, Message.id, Message.timestamp, Message.group_id
+        ).join(latest_ids, Message.id == latest_ids.c.last_id).all()
+
+        # Per-recipient unread counts for 1-on-1 threads; group messages have no per-user status
+        unread = {(key, receiver_id): count for key, receiver_id, count in db.session.query(
+            Message.conversation_key, Message.receiver_id, func.count(Message.id)
+        ).filter(
+            Message.receiver_id != None,
+            Message.status.in_(('sent', 'delivered'))
+        ).group_by(Message.conversation_key, Message.receiver_id)}
+
+        members = {}
+        for group_id, user_id in db.session.query(GroupMember.group_id, GroupMember.user_id):
+            members.setdefault(group_id, []).append(user_id)
+
+        existing = set(db.session.query(Conversation.user_id, Conversation.conversation_key))
+
+        rows = []
+        for key, last_id, last_timestamp, group_id in latest:
+            if group_id:
+                participants = {uid: None for uid in members.get(group_id, [])}
+            else:
+                low, high = (int(part) for part in key.split(':')[1:])
+                participants = {low: high, high: low}
+
+            for user_id, peer_id in participants.items():
+                if (user_id, key) in existing:
+                    continue
+                rows.append(Conversation(
+                    user_id=user_id,
+                    conversation_key=key,
+                    peer_id=peer_id,
+                    group_id=group_id,
+                    last_message_id=last_id,
+                    last_timestamp=last_timestamp,
+                    unread_count=unread.get((key, user_id), 0)
+                ))
+
+        for start in range(0, len(rows), BATCH_SIZE):
+            db.session.add_all(rows[start:start + BATCH_SIZE])
+            db.session.commit()
+
+        print(f"Created {len(rows)} inbox rows for {len(latest)} conversations.")
+
+if __name__ == '__main__':
+    backfill(app)
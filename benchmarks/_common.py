@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+import time
+
+# Benchmarks run against a throwaway SQLite database: python -m benchmarks.<name> [--help]
+_db_dir = tempfile.mkdtemp(prefix='chatapp-bench-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_db_dir, 'bench.db')}")
+os.environ.setdefault('PUSH_TRANSPORT', 'fake')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def load_app():
+    from app import app
+    return app
+
+def create_users(n, prefix='user', batch=10000):
+    # Bulk insert of n users with distinct usernames and phones; returns their ids
+    from database.db import db
+    from database.models import User
+    start = db.session.query(db.func.count(User.id)).scalar()
+    for low in range(0, n, batch):
+        db.session.execute(User.__table__.insert(), [
+            {'username': f"{prefix}{start + i}", 'phone': f"+{start + i:011d}", 'password_hash': 'x'}
+            for i in range(low, min(low + batch, n))
+        ])
+    db.session.commit()
+    return [uid for (uid,) in db.session.query(User.id).filter(User.username.like(f"{prefix}%")).order_by(User.id)]
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def report(title, rows):
+    # rows: list of (label, value) pairs
+    print(title)
+    width = max(len(label) for label, _ in rows)
+    for label, value in rows:
+        print(f"  {label.ljust(width)}  {value}")
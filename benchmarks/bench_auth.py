@@ -0,0 +1,55 @@
+import argparse
+from benchmarks._common import create_users, load_app, report, timed
+
+# Auth overhead per request: a full HMAC verification on every call versus the verified-token
+# cache, both for the bare verify and for a request through the before_request middleware.
+
+def run(requests):
+    app = load_app()
+    import jwt
+    from utils import token
+    from utils.auth import load_current_user, principal_for_token
+
+    with app.app_context():
+        uid = create_users(1, prefix='auth')[0]
+    jwt_token = token.generate_token(uid)
+    headers = {'Authorization': f"Bearer {jwt_token}"}
+
+    def uncached_decode():
+        for _ in range(requests):
+            jwt.decode(jwt_token, token._secret, algorithms=['HS256'])
+
+    def cached_verify():
+        for _ in range(requests):
+            token.verify_token(jwt_token)
+
+    def principal(clear):
+        with app.app_context():
+            for _ in range(requests):
+                if clear:
+                    token.init_tokens(app)
+                principal_for_token(jwt_token)
+
+    def middleware():
+        # What before_request runs: header parsing, verification and the principal lookup
+        with app.test_request_context(headers=headers):
+            for _ in range(requests):
+                load_current_user()
+
+    rows = []
+    for label, fn in (
+        ('jwt.decode every call', uncached_decode),
+        ('cached verify_token', cached_verify),
+        ('principal, cold token cache', lambda: principal(True)),
+        ('principal, warm token cache', lambda: principal(False)),
+        ('load_current_user per request', middleware),
+    ):
+        _, elapsed = timed(fn)
+        rows.append((label, f"{elapsed / requests * 1e6:.1f} us"))
+    report(f"Auth cost per call ({requests:,} calls)", rows)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+    run(args.requests)
@@ -0,0 +1,60 @@
+import argparse
+from benchmarks._common import create_users, load_app, report
+
+# Group fan-out for 1k / 10k-member groups: total time per message and the longest stretch the
+# event loop went without running other greenlets (what every other socket would feel).
+
+def run(sizes, online_ratio, messages):
+    app = load_app()
+    import time
+    from extensions import socketio
+    from database.db import db
+    from database.models import Group, GroupMember
+    from sockets import group_fanout
+    from utils.presence import get_presence
+
+    rows = []
+    for size in sizes:
+        with app.app_context():
+            members = create_users(size, prefix=f"fanout{size}_")
+            group = Group(name=f"g{size}", created_by=members[0])
+            db.session.add(group)
+            db.session.flush()
+            db.session.execute(GroupMember.__table__.insert(), [
+                {'group_id': group.id, 'user_id': uid, 'role': 'member'} for uid in members
+            ])
+            db.session.commit()
+            for uid in members[:int(size * online_ratio)]:
+                get_presence().connect(uid, f"sid-{uid}")
+
+            # Ticker greenlet: the largest gap between its wake-ups is the worst loop stall
+            gaps, running = [0.0], [True]
+
+            def ticker():
+                last = time.perf_counter()
+                while running[0]:
+                    socketio.sleep(0)
+                    now = time.perf_counter()
+                    gaps[0] = max(gaps[0], now - last)
+                    last = now
+            socketio.start_background_task(ticker)
+            socketio.sleep(0)
+
+            started = time.perf_counter()
+            for i in range(messages):
+                group_fanout.fan_out(group.id, 'new_group_message', {'message': f"m{i}"})
+            elapsed = time.perf_counter() - started
+            running[0] = False
+            socketio.sleep(0)
+
+        rows.append((f"{size} members", f"{elapsed / messages * 1000:.2f} ms/message, "
+                                        f"max loop stall {gaps[0] * 1000:.2f} ms"))
+    report(f"Group fan-out ({online_ratio:.0%} online, {messages} messages)", rows)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--online', type=float, default=0.5)
+    parser.add_argument('--messages', type=int, default=20)
+    args = parser.parse_args()
+    run(args.sizes, args.online, args.messages)
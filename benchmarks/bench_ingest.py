@@ -0,0 +1,43 @@
+import argparse
+from benchmarks._common import create_users, load_app, report, timed
+
+# Socket message write throughput: one INSERT + COMMIT per message vs group commit
+# (MESSAGE_GROUP_COMMIT), with many concurrent senders as under the eventlet worker.
+
+def run(senders, messages):
+    app = load_app()
+    import eventlet
+    from database import ingest
+
+    with app.app_context():
+        users = create_users(senders + 1, prefix='ingest')
+    receiver, senders_ids = users[0], users[1:]
+
+    def send(sender_id):
+        with app.app_context():
+            for i in range(messages):
+                ingest.save_message(sender_id=sender_id, receiver_id=receiver, message=f"m{i}", message_type='text')
+
+    def run_all():
+        pool = eventlet.GreenPool(senders)
+        for sender_id in senders_ids:
+            pool.spawn(send, sender_id)
+        pool.waitall()
+
+    total = senders * messages
+    rows = []
+    for mode in (False, True):
+        ingest._settings['group_commit'] = mode
+        batches = ingest.stats()['batches']
+        _, elapsed = timed(run_all)
+        batches = ingest.stats()['batches'] - batches
+        rows.append(('group commit' if mode else 'per-message commit',
+                     f"{total / elapsed:,.0f} msg/s ({batches} transactions for {total} messages)"))
+    report(f"Message ingest, {senders} concurrent senders x {messages} messages", rows)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--senders', type=int, default=100)
+    parser.add_argument('--messages', type=int, default=50)
+    args = parser.parse_args()
+    run(args.senders, args.messages)
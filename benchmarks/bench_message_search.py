@@ -0,0 +1,58 @@
+import argparse
+import random
+from benchmarks._common import create_users, load_app, percentile, report, timed
+
+# Message search latency on a large corpus: the FTS index (scoped to the caller's
+# conversations, ranked) versus the LIKE scan it replaces.
+WORDS = [f"w{i}" for i in range(20000)]
+
+def run(messages, users, queries, batch=20000):
+    app = load_app()
+    from sqlalchemy import text
+    from database.db import db
+    from database.models import Conversation, Message, conversation_key
+    from database.search import search_messages
+
+    rng = random.Random(7)
+    with app.app_context():
+        ids = create_users(users, prefix='search')
+        pairs = [(rng.choice(ids), rng.choice(ids)) for _ in range(users * 5)]
+        pairs = [(a, b) for a, b in pairs if a != b]
+        for low in range(0, messages, batch):
+            rows = []
+            for _ in range(min(batch, messages - low)):
+                a, b = rng.choice(pairs)
+                rows.append({'sender_id': a, 'receiver_id': b, 'conversation_key': conversation_key(a, b),
+                             'message': ' '.join(rng.choices(WORDS, k=8)), 'message_type': 'text', 'status': 'sent'})
+            db.session.execute(Message.__table__.insert(), rows)
+            db.session.commit()
+        seen = set()
+        db.session.execute(Conversation.__table__.insert(), [
+            {'user_id': uid, 'conversation_key': key, 'peer_id': peer, 'unread_count': 0}
+            for a, b in pairs for uid, peer, key in ((a, b, conversation_key(a, b)), (b, a, conversation_key(a, b)))
+            if (uid, key) not in seen and not seen.add((uid, key))
+        ])
+        db.session.commit()
+
+        fts, like = [], []
+        for _ in range(queries):
+            user_id, term = rng.choice(ids), rng.choice(WORDS)
+            fts.append(timed(search_messages, user_id, term, 20, 0)[1])
+        for _ in range(max(3, queries // 20)):
+            term = rng.choice(WORDS)
+            like.append(timed(lambda: db.session.execute(text(
+                "SELECT id FROM message WHERE message LIKE :q ORDER BY id DESC LIMIT 20"
+            ), {'q': f"%{term}%"}).all())[1])
+
+    report(f"Message search over {messages:,} messages, {users:,} users", [
+        ('FTS (scoped, ranked)', f"p50 {percentile(fts, 50) * 1000:.1f} ms, p95 {percentile(fts, 95) * 1000:.1f} ms"),
+        ('LIKE scan (unscoped)', f"p50 {percentile(like, 50) * 1000:.1f} ms, p95 {percentile(like, 95) * 1000:.1f} ms"),
+    ])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=2000000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+    run(args.messages, args.users, args.queries)
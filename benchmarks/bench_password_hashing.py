@@ -0,0 +1,54 @@
+import argparse
+from benchmarks._common import load_app, percentile, report
+
+# Socket responsiveness during a login storm: a greenlet standing in for socket handling
+# measures how late each of its 1 ms ticks fires while N concurrent logins hash passwords,
+# inline on the event loop versus through utils.passwords (native thread pool).
+
+def run(logins, method):
+    load_app()
+    import time
+    import eventlet
+    from werkzeug.security import generate_password_hash
+    from utils import passwords
+
+    passwords._settings['method'] = method
+
+    def storm(hash_fn):
+        delays, running = [], [True]
+
+        def ticker():
+            while running[0]:
+                expected = time.perf_counter() + 0.001
+                eventlet.sleep(0.001)
+                delays.append(time.perf_counter() - expected)
+
+        tick = eventlet.spawn(ticker)
+        eventlet.sleep(0.01)
+        started = time.perf_counter()
+        pool = eventlet.GreenPool(logins)
+        for i in range(logins):
+            pool.spawn(hash_fn, f"password-{i}")
+        pool.waitall()
+        elapsed = time.perf_counter() - started
+        running[0] = False
+        tick.wait()
+        return delays, elapsed
+
+    rows = []
+    for label, fn in (
+        ('inline', lambda pw: generate_password_hash(pw, method=method)),
+        ('thread pool', passwords.hash_password),
+    ):
+        delays, elapsed = storm(fn)
+        rows.append((label, f"tick lag p50 {percentile(delays, 50) * 1000:.1f} ms, "
+                            f"p99 {percentile(delays, 99) * 1000:.1f} ms, max {max(delays) * 1000:.0f} ms; "
+                            f"{logins / elapsed:.1f} hashes/s"))
+    report(f"Login storm: {logins} concurrent hashes ({method})", rows)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=50)
+    parser.add_argument('--method', default='scrypt')
+    args = parser.parse_args()
+    run(args.logins, args.method)
@@ -0,0 +1,74 @@
+import argparse
+from benchmarks._common import create_users, load_app, report, timed
+
+# Registrations/sec on a table that already holds --existing users: the old check-then-insert
+# (phone lookup, username lookup, insert) versus the single INSERT that POST /auth/register
+# now runs, both inline; then the endpoint itself. Hashing is set to a cheap method so the
+# database path is what gets measured.
+
+def run(existing, registrations):
+    app = load_app()
+    from flask import jsonify
+    from sqlalchemy.exc import IntegrityError
+    from database.db import db
+    from database.models import User
+    from utils import passwords, usernames
+
+    passwords._settings['method'] = 'pbkdf2:sha256:1'
+    with app.app_context():
+        create_users(existing, prefix='existing')
+        usernames.rebuild()
+    client = app.test_client()
+
+    def check_then_insert(username, phone):
+        # The pre-change register body, minus hashing
+        if User.query.filter_by(phone=phone).first():
+            return jsonify({'error': 'Phone number already registered'}), 400
+        if User.query.filter_by(username=username).first():
+            return jsonify({'error': 'Username already taken'}), 400
+        db.session.add(User(username=username, phone=phone, password_hash='x'))
+        db.session.commit()
+        return jsonify({}), 201
+
+    def single_insert(username, phone):
+        try:
+            db.session.add(User(username=username, phone=phone, password_hash='x'))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'error': 'User already exists'}), 400
+        return jsonify({}), 201
+
+    def inline(register, prefix):
+        with app.app_context():
+            for i in range(registrations):
+                register(f"{prefix}{i}", f"+{prefix}{i}")
+
+    def endpoint(prefix):
+        for i in range(registrations):
+            client.post('/auth/register', json={
+                'username': f"{prefix}{i}", 'phone': f"+{prefix}{i}", 'password': 'pw123456'
+            })
+
+    def available(prefix):
+        with app.test_request_context():
+            for i in range(registrations):
+                usernames.is_username_available(f"{prefix}{i}")
+
+    _, old_elapsed = timed(inline, check_then_insert, 'old')
+    _, new_elapsed = timed(inline, single_insert, 'new')
+    _, endpoint_elapsed = timed(endpoint, 'api')
+    _, free_elapsed = timed(available, 'free')
+    report(f"Registration, {existing} existing users", [
+        ('check-then-insert', f"{registrations / old_elapsed:.0f} registrations/s (3 statements)"),
+        ('single insert', f"{registrations / new_elapsed:.0f} registrations/s (1 statement)"),
+        ('endpoint', f"{registrations / endpoint_elapsed:.0f} registrations/s via POST /auth/register"),
+        ('availability', f"{free_elapsed / registrations * 1e6:.1f} us per free-name check (Bloom filter)"),
+    ])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--existing', type=int, default=100000)
+    parser.add_argument('--registrations', type=int, default=1000)
+    args = parser.parse_args()
+    run(args.existing, args.registrations)
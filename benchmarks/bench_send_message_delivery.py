@@ -0,0 +1,43 @@
+import argparse
+import contextlib
+import io
+from benchmarks._common import create_users, load_app, report, timed
+
+# Per-message cost of POST /chat/sendMessage as the number of connected clients grows.
+# With room-targeted emits it should stay flat; a broadcast grows linearly with clients.
+
+def run(client_counts, messages):
+    app = load_app()
+    from extensions import socketio
+    from utils.token import generate_token
+
+    rows = []
+    with app.app_context():
+        user_ids = create_users(max(client_counts) + 2, prefix='delivery')
+    sender, receiver, others = user_ids[0], user_ids[1], user_ids[2:]
+    http = app.test_client()
+
+    connected = []
+    for count in sorted(client_counts):
+        with contextlib.redirect_stdout(io.StringIO()): # connect handler logs every session
+            while len(connected) < count:
+                uid = others[len(connected)]
+                connected.append(socketio.test_client(app, query_string=f"token={generate_token(uid)}"))
+        for c in connected:
+            c.get_received() # drop user_online broadcasts from the connects
+
+        def send_all():
+            for i in range(messages):
+                http.post('/chat/sendMessage', json={'sender_id': sender, 'receiver_id': receiver, 'message': f"m{i}"})
+        _, elapsed = timed(send_all)
+        delivered = sum(len(c.get_received()) for c in connected)
+        rows.append((f"{count} clients", f"{elapsed / messages * 1000:.3f} ms/message, {delivered} events to bystanders"))
+
+    report(f"sendMessage delivery cost ({messages} messages per run)", rows)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--messages', type=int, default=200)
+    args = parser.parse_args()
+    run(args.clients, args.messages)
@@ -0,0 +1,50 @@
+import argparse
+from benchmarks._common import create_users, load_app, report, timed
+
+# Per-row cost of serializing chat history: the old hand-built dicts over ORM objects versus
+# the precompiled MESSAGE serializer over column-only row tuples (query time included).
+
+def run(rows, repeat):
+    app = load_app()
+    from database.db import db
+    from database.models import Message
+    from utils.serializers import MESSAGE
+
+    with app.app_context():
+        sender, receiver = create_users(2, prefix='serializer')
+        db.session.execute(Message.__table__.insert(), [
+            {'sender_id': sender, 'receiver_id': receiver, 'message': f"message {i}", 'message_type': 'text',
+             'status': 'sent', 'conversation_key': f"u:{sender}:{receiver}"}
+            for i in range(rows)
+        ])
+        db.session.commit()
+
+        def hand_built():
+            db.session.expunge_all()
+            return [{
+                'id': msg.id,
+                'sender_id': msg.sender_id,
+                'receiver_id': msg.receiver_id,
+                'message': msg.message,
+                'timestamp': msg.timestamp.isoformat(),
+                'message_type': msg.message_type,
+                'media_url': msg.media_url,
+                'status': msg.status
+            } for msg in Message.query.all()]
+
+        def compiled_rows():
+            return MESSAGE.dump_rows(MESSAGE.query().all())
+
+        results = []
+        for label, fn in (('ORM objects + dict building', hand_built), ('row tuples + compiled serializer', compiled_rows)):
+            best = min(timed(fn)[1] for _ in range(repeat))
+            results.append((label, f"{best / rows * 1e6:.2f} us/row"))
+        assert hand_built() == compiled_rows()
+    report(f"Serializing {rows:,} messages (best of {repeat})", results)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
@@ -0,0 +1,59 @@
+import argparse
+import gc
+from benchmarks._common import create_users, load_app, report, timed
+
+# Peak RSS while exporting every user through GET /admin/users (streamed with yield_per)
+# versus building the whole list and serializing it at once, as the endpoint used to.
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def run(rows):
+    app = load_app()
+    from database.models import User
+    from utils.serializers import USER_DETAIL
+    from utils.token import generate_token
+
+    with app.app_context():
+        admin = create_users(1, prefix='admin')[0]
+        User.query.get(admin).is_admin = True
+        from database.db import db
+        db.session.commit()
+        create_users(rows, prefix='export')
+    token = generate_token(admin)
+    client = app.test_client()
+
+    def streamed():
+        gc.collect()
+        base, peak, size = rss_mb(), 0.0, 0
+        response = client.get('/admin/users', headers={'Authorization': f"Bearer {token}"})
+        for i, piece in enumerate(response.response):
+            size += len(piece)
+            if i % 50 == 0:
+                peak = max(peak, rss_mb() - base)
+        return peak, size
+
+    def materialized():
+        gc.collect()
+        base = rss_mb()
+        with app.app_context():
+            body = app.json.dumps([USER_DETAIL.dump(user) for user in User.query.all()])
+            peak = rss_mb() - base
+        return peak, len(body)
+
+    (stream_peak, stream_size), stream_time = timed(streamed)
+    (list_peak, list_size), list_time = timed(materialized)
+    report(f"Exporting {rows:,} users", [
+        ('streamed', f"+{stream_peak:.1f} MB peak RSS, {stream_size / 1e6:.1f} MB body, {stream_time:.1f} s"),
+        ('full list', f"+{list_peak:.1f} MB peak RSS, {list_size / 1e6:.1f} MB body, {list_time:.1f} s"),
+    ])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000, help='use 1000000 for the full-size run')
+    args = parser.parse_args()
+    run(args.rows)
@@ -0,0 +1,41 @@
+import argparse
+import random
+from benchmarks._common import create_users, load_app, percentile, report, timed
+
+# Typeahead latency at 1M users: indexed prefix (1-2 chars) and trigram (3+ chars) search,
+# cold and through the autocomplete cache, against the old unbounded ilike('%q%') scan.
+
+def run(users, queries):
+    app = load_app()
+    from database import search
+    from database.models import User
+
+    rng = random.Random(11)
+    with app.app_context():
+        create_users(users, prefix='member')
+        terms = {
+            'prefix (2 chars)': ['me', 'Me'],
+            'trigram (3+ chars)': [f"{rng.randrange(users):06d}"[:rng.choice((3, 4, 5))] for _ in range(queries)],
+        }
+        rows = []
+        for label, pool in terms.items():
+            cold, warm = [], []
+            for _ in range(queries):
+                q = rng.choice(pool)
+                search.clear_user_search_cache()
+                cold.append(timed(search.search_users, q, 20)[1])
+                warm.append(timed(search.search_users, q, 20)[1])
+            rows.append((f"{label}, cold", f"p50 {percentile(cold, 50) * 1000:.2f} ms, p95 {percentile(cold, 95) * 1000:.2f} ms"))
+            rows.append((f"{label}, cached", f"p50 {percentile(warm, 50) * 1000:.3f} ms"))
+
+        old = [timed(lambda: User.query.filter(User.username.ilike(f"%{rng.choice(terms['trigram (3+ chars)'])}%")).all())[1]
+               for _ in range(max(3, queries // 20))]
+        rows.append(('old ilike scan, unbounded', f"p50 {percentile(old, 50) * 1000:.1f} ms"))
+    report(f"User search over {users:,} users", rows)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+    run(args.users, args.queries)
@@ -1,6 +1,103 @@
 import os
 
+def engine_options(uri):
+    # Engine profile per backend, passed to create_engine by Flask-SQLAlchemy at db.init_app
+    if uri.startswith('sqlite'):
+        # One writer at a time: wait on the lock instead of failing with "database is locked".
+        # The WAL / synchronous pragmas are applied per connection in database/db.py
+        return {'connect_args': {'timeout': Config.SQLITE_BUSY_TIMEOUT_MS / 1000.0}}
+    return {
+        'pool_size': Config.DB_POOL_SIZE,
+        'max_overflow': Config.DB_MAX_OVERFLOW,
+        'pool_timeout': Config.DB_POOL_TIMEOUT,
+        'pool_recycle': Config.DB_POOL_RECYCLE,
+        'pool_pre_ping': True
+    }
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///chatapp.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Verified JWTs kept in memory (bounded LRU, entries expire with the token)
+    TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+
+    # Password hashing: werkzeug method string (e.g. 'scrypt:32768:8:1', 'pbkdf2:sha256:600000'),
+    # concurrent hashes allowed, and how long a request may wait for a slot before a 503
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD')
+    PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', 4))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5)) # seconds
+
+    # Bloom filter behind /auth/username-available
+    USERNAME_FILTER_CAPACITY = int(os.environ.get('USERNAME_FILTER_CAPACITY', 1000000))
+    USERNAME_FILTER_ERROR_RATE = float(os.environ.get('USERNAME_FILTER_ERROR_RATE', 0.01))
+    USERNAME_FILTER_REFRESH = int(os.environ.get('USERNAME_FILTER_REFRESH', 300)) # seconds
+
+    # 'orjson' switches jsonify and streamed responses to orjson when it is installed
+    JSON_BACKEND = os.environ.get('JSON_BACKEND') or 'default'
+
+    # Uploads: larger request bodies are rejected before they are read
+    MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 200 * 1024 * 1024))
+    MAX_CONTENT_LENGTH = MAX_UPLOAD_SIZE
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024)) # suggested to clients
+
+    # Media serving: hand the bytes to the front proxy (e.g. '/protected-media') or use X-Sendfile
+    MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX')
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+
+    # Background thumbnail / poster generation (see utils/media_previews.py)
+    MEDIA_PREVIEW_WORKERS = int(os.environ.get('MEDIA_PREVIEW_WORKERS', 2))
+    MEDIA_THUMBNAIL_SIZE = int(os.environ.get('MEDIA_THUMBNAIL_SIZE', 320))
+
+    # Optional shared Redis, used to keep caches coherent across gunicorn workers
+    REDIS_URL = os.environ.get('REDIS_URL')
+
+    # Socket.IO pub/sub between processes; unset means in-process delivery (single process, tests).
+    # gunicorn can't route a client back to the same worker, so keep -w 1 (see Procfile) and scale
+    # out by running several single-worker processes on separate ports behind a proxy with sticky
+    # sessions (e.g. nginx ip_hash), all pointing at the same queue.
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or REDIS_URL
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL') or 'flask-socketio'
+
+    # Redis presence: a worker that stops heartbeating for this long has its sessions purged
+    PRESENCE_WORKER_TTL = int(os.environ.get('PRESENCE_WORKER_TTL', 60)) # seconds
+
+    PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_SIZE', 10000))
+    PROFILE_CACHE_TTL = int(os.environ.get('PROFILE_CACHE_TTL', 300)) # seconds
+
+    # Write-behind presence persistence (see utils/last_seen.py)
+    LAST_SEEN_FLUSH_INTERVAL = float(os.environ.get('LAST_SEEN_FLUSH_INTERVAL', 5)) # seconds
+    LAST_SEEN_MAX_PENDING = int(os.environ.get('LAST_SEEN_MAX_PENDING', 5000))
+
+    # Group commit for socket messages: one transaction per batch instead of per message
+    MESSAGE_GROUP_COMMIT = os.environ.get('MESSAGE_GROUP_COMMIT', '').lower() in ('1', 'true', 'yes')
+    MESSAGE_BATCH_SIZE = int(os.environ.get('MESSAGE_BATCH_SIZE', 100))
+    MESSAGE_BATCH_DELAY_MS = float(os.environ.get('MESSAGE_BATCH_DELAY_MS', 5))
+
+    # Group delivery (see sockets/group_fanout.py)
+    GROUP_MEMBER_CACHE_TTL = int(os.environ.get('GROUP_MEMBER_CACHE_TTL', 60)) # seconds
+    GROUP_MEMBER_CACHE_SIZE = int(os.environ.get('GROUP_MEMBER_CACHE_SIZE', 10000))
+    GROUP_FANOUT_CHUNK_SIZE = int(os.environ.get('GROUP_FANOUT_CHUNK_SIZE', 500))
+
+    # Push notifications for offline recipients (see utils/push.py); 'fcm', 'fake' or 'none'
+    PUSH_TRANSPORT = os.environ.get('PUSH_TRANSPORT', 'fcm')
+    PUSH_COALESCE_SECONDS = float(os.environ.get('PUSH_COALESCE_SECONDS', 2)) # burst window per chat
+    PUSH_BATCH_SIZE = int(os.environ.get('PUSH_BATCH_SIZE', 500)) # FCM multicast limit
+    PUSH_MAX_RETRIES = int(os.environ.get('PUSH_MAX_RETRIES', 5))
+    PUSH_RETRY_BASE_SECONDS = float(os.environ.get('PUSH_RETRY_BASE_SECONDS', 1))
+    PUSH_BODY_MAX_LENGTH = int(os.environ.get('PUSH_BODY_MAX_LENGTH', 240)) # characters; FCM caps payloads at 4KB
+
+    # Autocomplete cache for first-page user search results
+    USER_SEARCH_CACHE_TTL = int(os.environ.get('USER_SEARCH_CACHE_TTL', 30)) # seconds
+    USER_SEARCH_CACHE_SIZE = int(os.environ.get('USER_SEARCH_CACHE_SIZE', 2000))
+
+    # Database engine tuning
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30)) # seconds
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800)) # seconds
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+
+Config.SQLALCHEMY_ENGINE_OPTIONS = engine_options(Config.SQLALCHEMY_DATABASE_URI)
@@ -1,3 +1,49 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
 db = SQLAlchemy()
+
+_pool_stats = {'checkouts': 0, 'checked_out': 0, 'peak_checked_out': 0, 'connects': 0}
+
+def configure_engine(app):
+    # Call right after db.init_app, before anything opens a connection
+    with app.app_context():
+        engine = db.engine
+
+    if engine.dialect.name == 'sqlite':
+        journal_mode = app.config.get('SQLITE_JOURNAL_MODE', 'WAL')
+        synchronous = app.config.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+        busy_timeout = int(app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
+        @event.listens_for(engine, 'connect')
+        def _sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+            cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+            cursor.close()
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        _pool_stats['connects'] += 1
+
+    @event.listens_for(engine, 'checkout')
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        _pool_stats['checkouts'] += 1
+        _pool_stats['checked_out'] += 1
+        _pool_stats['peak_checked_out'] = max(_pool_stats['peak_checked_out'], _pool_stats['checked_out'])
+
+    @event.listens_for(engine, 'checkin')
+    def _on_checkin(dbapi_connection, connection_record):
+        _pool_stats['checked_out'] -= 1
+
+def pool_stats():
+    pool = db.engine.pool
+    result = dict(_pool_stats)
+    result['pool'] = type(pool).__name__
+    # QueuePool exposes its sizing; other pool classes don't
+    for name in ('size', 'checkedin', 'overflow'):
+        method = getattr(pool, name, None)
+        if method is not None:
+            result[name] = method()
+    return result
@@ -0,0 +1,57 @@
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from database.db import db
+from database.models import DeviceToken
+
+def register_device(user_id, token, platform=None):
+    # Insert or refresh; a token seen under another account (shared device, re-login) moves over
+    device = DeviceToken.query.filter_by(token=token).first()
+    if device is None:
+        device = DeviceToken(user_id=user_id, token=token, platform=platform or 'android')
+        db.session.add(device)
+        try:
+            db.session.commit()
+            return device
+        except IntegrityError:
+            # Concurrent registration of the same token; refresh the row that won
+            db.session.rollback()
+            device = DeviceToken.query.filter_by(token=token).first()
+
+    device.user_id = user_id
+    if platform:
+        device.platform = platform
+    device.updated_at = datetime.utcnow()
+    db.session.commit()
+    return device
+
+def revoke_device(token, user_id=None):
+    query = DeviceToken.query.filter_by(token=token)
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    deleted = query.delete(synchronize_session=False)
+    db.session.commit()
+    return deleted > 0
+
+def tokens_for(user_ids):
+    # {user_id: [tokens]} for all recipients in one IN query (uses the user_id index)
+    user_ids = {int(uid) for uid in user_ids}
+    if not user_ids:
+        return {}
+    result = {}
+    rows = db.session.query(DeviceToken.user_id, DeviceToken.token).filter(DeviceToken.user_id.in_(user_ids))
+    for user_id, token in rows:
+        result.setdefault(user_id, []).append(token)
+    return result
+
+def prune_tokens(tokens):
+    # Called by the push dispatcher with tokens the transport reported as unregistered/invalid
+    if not tokens:
+        return 0
+    deleted = DeviceToken.query.filter(DeviceToken.token.in_(list(tokens))).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+def init_devices(app):
+    from utils import push
+    push.set_token_resolver(tokens_for)
+    push.set_invalid_token_handler(prune_tokens)
@@ -0,0 +1,101 @@
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database.db import db
+from database.models import Conversation, GroupMember, Message
+
+UPSERT_CHUNK_SIZE = 1000 # rows per statement; 7 parameters each
+
+def record_message(message):
+    # Call after the message is flushed (id and timestamp assigned) and before commit,
+    # so the inbox rows land in the same transaction as the message itself.
+    key = message.conversation_key
+    if key is None:
+        return
+
+    sender_id = int(message.sender_id)
+
+    if message.group_id:
+        group_id = int(message.group_id)
+        participants = {uid: None for (uid,) in db.session.query(GroupMember.user_id).filter_by(group_id=group_id)}
+        participants[sender_id] = None
+    else:
+        group_id = None
+        receiver_id = int(message.receiver_id)
+        participants = {sender_id: receiver_id, receiver_id: sender_id}
+
+    # INSERT ... ON CONFLICT per chunk of participants: creates missing rows and bumps existing
+    # ones atomically, so two first messages in a new thread can't race on uq_conversation_user_key
+    rows = [
+        {
+            'user_id': uid,
+            'conversation_key': key,
+            'peer_id': peer_id,
+            'group_id': group_id,
+            'last_message_id': message.id,
+            'last_timestamp': message.timestamp,
+            'unread_count': 0 if uid == sender_id else 1
+        }
+        for uid, peer_id in participants.items()
+    ]
+    table = Conversation.__table__
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        # Chunked to stay under the bound-parameter limit for large groups
+        stmt = _insert(table).values(rows[start:start + UPSERT_CHUNK_SIZE])
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['user_id', 'conversation_key'],
+            set_={
+                'last_message_id': stmt.excluded.last_message_id,
+                'last_timestamp': stmt.excluded.last_timestamp,
+                'unread_count': table.c.unread_count + stmt.excluded.unread_count
+            }
+        ))
+
+def _insert(table):
+    # Both supported backends spell the upsert the same way, from their own dialect module
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql_insert(table)
+    return sqlite_insert(table)
+
+def mark_delivered(user_id, key, peer_id=None, up_to_id=None):
+    # Moves the delivered watermark and flips 'sent' -> 'delivered' for the peer's messages
+    # in one set-based UPDATE. Returns the new watermark, or None if nothing changed.
+    return _advance(user_id, key, peer_id, up_to_id, 'last_delivered_message_id', ('sent',), 'delivered')
+
+def mark_read(user_id, key, peer_id=None, up_to_id=None):
+    # Same as mark_delivered for 'seen', and recomputes unread_count from the watermark
+    return _advance(user_id, key, peer_id, up_to_id, 'last_read_message_id', ('sent', 'delivered'), 'seen')
+
+def _advance(user_id, key, peer_id, up_to_id, watermark_field, from_statuses, to_status):
+    conv = Conversation.query.filter_by(user_id=user_id, conversation_key=key).first()
+    if not conv or not conv.last_message_id:
+        return None
+
+    up_to = conv.last_message_id if up_to_id is None else min(int(up_to_id), conv.last_message_id)
+    previous = getattr(conv, watermark_field) or 0
+    if up_to <= previous:
+        return None
+
+    if peer_id is not None:
+        # Per-message status only makes sense for 1-on-1 threads; the (conversation_key, id)
+        # index bounds this to the messages between the old and new watermark
+        Message.query.filter(
+            Message.conversation_key == key,
+            Message.sender_id == peer_id,
+            Message.id > previous,
+            Message.id <= up_to,
+            Message.status.in_(from_statuses)
+        ).update({'status': to_status}, synchronize_session=False)
+
+    setattr(conv, watermark_field, up_to)
+    if watermark_field == 'last_read_message_id':
+        # Reading implies delivery
+        conv.last_delivered_message_id = max(conv.last_delivered_message_id or 0, up_to)
+        if up_to >= conv.last_message_id:
+            conv.unread_count = 0
+        else:
+            conv.unread_count = Message.query.filter(
+                Message.conversation_key == key,
+                Message.id > up_to,
+                Message.sender_id != user_id
+            ).count()
+    return up_to
@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+from database.db import db
+from database.models import Message
+from database.inbox import record_message
+
+# What callers need once a message is durable
+StoredMessage = namedtuple('StoredMessage', ['id', 'timestamp'])
+
+class _Pending:
+    __slots__ = ('fields', 'done', 'result', 'error')
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+_queue = queue.Queue()
+_app = None
+_started = False
+_start_lock = threading.Lock()
+
+_settings = {'group_commit': False, 'max_batch': 100, 'max_delay': 0.005, 'timeout': 10.0}
+_stats = {'batches': 0, 'messages': 0, 'largest_batch': 0, 'errors': 0}
+
+def init_ingest(app):
+    global _app
+    _app = app
+    _settings['group_commit'] = app.config.get('MESSAGE_GROUP_COMMIT', False)
+    _settings['max_batch'] = app.config.get('MESSAGE_BATCH_SIZE', 100)
+    _settings['max_delay'] = app.config.get('MESSAGE_BATCH_DELAY_MS', 5) / 1000.0
+
+def save_message(**fields):
+    # Persists one Message (plus its inbox rows) and returns a StoredMessage once committed.
+    # In group-commit mode the row is queued and written with its neighbours in one transaction.
+    pending = _Pending(fields)
+    if not _settings['group_commit']:
+        _write_batch([pending])
+    else:
+        _ensure_started()
+        _queue.put(pending)
+        if not pending.done.wait(_settings['timeout']):
+            raise TimeoutError("Message was not committed in time")
+
+    if pending.error is not None:
+        raise pending.error
+    return pending.result
+
+def _write_batch(batch):
+    try:
+        messages = [Message(**p.fields) for p in batch]
+        db.session.add_all(messages)
+        db.session.flush()
+        for p, msg in zip(batch, messages):
+            record_message(msg)
+            p.result = StoredMessage(msg.id, msg.timestamp)
+        db.session.commit()
+        _stats['batches'] += 1
+        _stats['messages'] += len(batch)
+        _stats['largest_batch'] = max(_stats['largest_batch'], len(batch))
+    except Exception as e:
+        db.session.rollback()
+        if len(batch) > 1:
+            # Don't let one bad row fail its neighbours: retry them one by one
+            for p in batch:
+                _write_batch([p])
+            return
+        _stats['errors'] += 1
+        batch[0].result = None
+        batch[0].error = e
+
+def _run():
+    while True:
+        batch = [_queue.get()]
+        deadline = time.monotonic() + _settings['max_delay']
+        while len(batch) < _settings['max_batch']:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            with _app.app_context():
+                _write_batch(batch)
+        finally:
+            # Releases the waiting handlers so they can ack and emit
+            for p in batch:
+                p.done.set()
+
+def _ensure_started():
+    global _started
+    if _started:
+        return
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    from extensions import socketio
+    socketio.start_background_task(_run)
+
+def stats():
+    result = dict(_stats)
+    result['group_commit'] = _settings['group_commit']
+    result['queued'] = _queue.qsize()
+    return result
@@ -1,6 +1,23 @@
+import re
 from datetime import datetime
+from sqlalchemy import event
 from database.db import db
 
+def conversation_key(user_id=None, other_user_id=None, group_id=None):
+    # One key per thread, identical for both directions of a 1-on-1 chat
+    if group_id:
+        return f"g:{int(group_id)}"
+    low, high = sorted((int(user_id), int(other_user_id)))
+    return f"u:{low}:{high}"
+
+def _message_conversation_key(context):
+    params = context.get_current_parameters()
+    if params.get('group_id'):
+        return conversation_key(group_id=params['group_id'])
+    if params.get('sender_id') and params.get('receiver_id'):
+        return conversation_key(params['sender_id'], params['receiver_id'])
+    return None
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -11,6 +28,9 @@ class User(db.Model):
     last_seen = db.Column(db.DateTime, default=datetime.utcnow)
     is_admin = db.Column(db.Boolean, default=False)
 
+# Prefix search on usernames is case-insensitive (see database/search.py)
+db.Index('ix_user_username_lower', db.func.lower(User.username))
+
 class Message(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -21,6 +41,11 @@ class Message(db.Model):
     message_type = db.Column(db.String(20), default="text") # text, image, audio
     media_url = db.Column(db.String(255))
     status = db.Column(db.String(20), default="sent") # sent, delivered, seen
+    conversation_key = db.Column(db.String(40), default=_message_conversation_key)
+
+    __table_args__ = (
+        db.Index('ix_message_conversation_id', 'conversation_key', 'id'),
+    )
 
 class Call(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -45,3 +70,73 @@ class GroupMember(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     role = db.Column(db.String(20), default="member") # admin, member
     joined_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Conversation(db.Model):
+    # Inbox row per participant, kept current on every message insert (see database/inbox.py)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    conversation_key = db.Column(db.String(40), nullable=False)
+    peer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True) # Null for Group conversations
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=True)
+    last_message_id = db.Column(db.Integer, db.ForeignKey('message.id'))
+    last_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    unread_count = db.Column(db.Integer, default=0, nullable=False)
+    last_delivered_message_id = db.Column(db.Integer) # Watermarks: everything up to this id
+    last_read_message_id = db.Column(db.Integer)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'conversation_key', name='uq_conversation_user_key'),
+        db.Index('ix_conversation_user_last', 'user_id', 'last_timestamp'),
+    )
+
+class UploadSession(db.Model):
+    # Resumable upload in progress; bytes live in instance/uploads_tmp/<id>.part until finalized
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    filename = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class DeviceToken(db.Model):
+    # Push token per installed client; a user can have many. Tokens move to whoever registers them last.
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    token = db.Column(db.String(255), unique=True, nullable=False)
+    platform = db.Column(db.String(20), default="android") # android, ios, web
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow) # Last register/refresh from the client
+
+class MediaBlob(db.Model):
+    # One row per stored file content; files live at static/uploads/<sha[:2]>/<sha[2:4]>/<sha>.<ext>
+    sha256 = db.Column(db.String(64), primary_key=True)
+    ext = db.Column(db.String(10), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False) # Messages whose media_url points here
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    preview_status = db.Column(db.String(20), default="pending") # pending, ready, none, failed
+    has_thumbnail = db.Column(db.Boolean, default=False) # <sha>.thumb.jpg next to the original
+    placeholder = db.Column(db.Text) # Tiny blurred JPEG as a data: URL
+
+_BLOB_URL = re.compile(r'/([0-9a-f]{64})\.[A-Za-z0-9]+$')
+
+def blob_hash_from_url(url):
+    match = _BLOB_URL.search(url or '')
+    return match.group(1) if match else None
+
+def _adjust_blob_refs(connection, target, delta):
+    sha = blob_hash_from_url(target.media_url)
+    if sha:
+        connection.execute(
+            MediaBlob.__table__.update()
+            .where(MediaBlob.sha256 == sha)
+            .values(ref_count=MediaBlob.ref_count + delta)
+        )
+
+@event.listens_for(Message, 'after_insert')
+def _message_blob_ref(mapper, connection, target):
+    _adjust_blob_refs(connection, target, 1)
+
+@event.listens_for(Message, 'after_delete')
+def _message_blob_unref(mapper, connection, target):
+    _adjust_blob_refs(connection, target, -1)
@@ -0,0 +1,227 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import DateTime, and_, func, or_, text
+from database.db import db
+from database.models import User
+from utils.serializers import MESSAGE_SEARCH, USER_SUMMARY
+
+# Messages the caller can see: their 1-on-1 threads plus groups they currently belong to.
+# Group access comes from group_member only, so removed members lose it immediately.
+_SCOPE = """(
+    m.conversation_key IN (SELECT conversation_key FROM conversation WHERE user_id = :user_id AND peer_id IS NOT NULL)
+    OR m.group_id IN (SELECT group_id FROM group_member WHERE user_id = :user_id)
+)"""
+_COLUMNS = ', '.join('m.' + name for name in MESSAGE_SEARCH.fields)
+
+class SqliteMessageSearch:
+    # FTS5 external-content index over message.message, kept in sync by triggers
+    def create(self):
+        existed = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'message_fts'"
+        )).first()
+        db.session.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(message, content='message', content_rowid='id')"
+        ))
+        db.session.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS message_fts_ai AFTER INSERT ON message BEGIN
+                INSERT INTO message_fts(rowid, message) VALUES (new.id, new.message);
+            END"""))
+        db.session.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS message_fts_ad AFTER DELETE ON message BEGIN
+                INSERT INTO message_fts(message_fts, rowid, message) VALUES ('delete', old.id, old.message);
+            END"""))
+        db.session.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS message_fts_au AFTER UPDATE OF message ON message BEGIN
+                INSERT INTO message_fts(message_fts, rowid, message) VALUES ('delete', old.id, old.message);
+                INSERT INTO message_fts(rowid, message) VALUES (new.id, new.message);
+            END"""))
+        if not existed:
+            # Index messages written before the table existed
+            db.session.execute(text("INSERT INTO message_fts(message_fts) VALUES ('rebuild')"))
+        db.session.commit()
+
+    def build_query(self, q):
+        # Quote every term so user input can't inject FTS syntax; the last one matches as a prefix
+        terms = ['"' + term.replace('"', '""') + '"' for term in q.split()]
+        if not terms:
+            return None
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, user_id, q, limit, offset):
+        match = self.build_query(q)
+        if match is None:
+            return []
+        return db.session.execute(text(f"""
+            SELECT {_COLUMNS}
+            FROM message_fts
+            JOIN message m ON m.id = message_fts.rowid
+            WHERE message_fts MATCH :match AND {_SCOPE}
+            ORDER BY bm25(message_fts), m.id DESC
+            LIMIT :limit OFFSET :offset
+        """).columns(timestamp=DateTime), {'match': match, 'user_id': user_id, 'limit': limit, 'offset': offset}).all()
+
+class PostgresMessageSearch:
+    # GIN expression index on the tsvector, so nothing extra needs syncing on insert
+    def create(self):
+        db.session.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_message_fts ON message USING gin (to_tsvector('simple', message))"
+        ))
+        db.session.commit()
+
+    def search(self, user_id, q, limit, offset):
+        return db.session.execute(text(f"""
+            SELECT {_COLUMNS}
+            FROM message m, plainto_tsquery('simple', :q) query
+            WHERE to_tsvector('simple', m.message) @@ query AND {_SCOPE}
+            ORDER BY ts_rank(to_tsvector('simple', m.message), query) DESC, m.id DESC
+            LIMIT :limit OFFSET :offset
+        """).columns(timestamp=DateTime), {'q': q, 'user_id': user_id, 'limit': limit, 'offset': offset}).all()
+
+class SqliteUserSearch:
+    # FTS5 trigram index over username and phone for substring matches (SQLite >= 3.34)
+    def __init__(self):
+        self.available = False
+
+    def create(self):
+        try:
+            existed = db.session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_fts'"
+            )).first()
+            db.session.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS user_fts USING fts5(username, phone, content='user', content_rowid='id', tokenize='trigram')"
+            ))
+            db.session.execute(text("""
+                CREATE TRIGGER IF NOT EXISTS user_fts_ai AFTER INSERT ON "user" BEGIN
+                    INSERT INTO user_fts(rowid, username, phone) VALUES (new.id, new.username, new.phone);
+                END"""))
+            db.session.execute(text("""
+                CREATE TRIGGER IF NOT EXISTS user_fts_ad AFTER DELETE ON "user" BEGIN
+                    INSERT INTO user_fts(user_fts, rowid, username, phone) VALUES ('delete', old.id, old.username, old.phone);
+                END"""))
+            db.session.execute(text("""
+                CREATE TRIGGER IF NOT EXISTS user_fts_au AFTER UPDATE OF username, phone ON "user" BEGIN
+                    INSERT INTO user_fts(user_fts, rowid, username, phone) VALUES ('delete', old.id, old.username, old.phone);
+                    INSERT INTO user_fts(rowid, username, phone) VALUES (new.id, new.username, new.phone);
+                END"""))
+            if not existed:
+                db.session.execute(text("INSERT INTO user_fts(user_fts) VALUES ('rebuild')"))
+            db.session.commit()
+            self.available = True
+        except Exception as e:
+            db.session.rollback()
+            print(f"Trigram user search not available, falling back to LIKE: {e}")
+
+    def substring_filter(self, q):
+        if not self.available:
+            return _like_filter(q)
+        match = '"' + q.replace('"', '""') + '"'
+        return User.id.in_(text("SELECT rowid FROM user_fts WHERE user_fts MATCH :user_match").bindparams(user_match=match))
+
+class PostgresUserSearch:
+    # pg_trgm GIN indexes make '%q%' LIKE filters index-assisted
+    def create(self):
+        try:
+            db.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            db.session.execute(text(
+                'CREATE INDEX IF NOT EXISTS ix_user_username_trgm ON "user" USING gin (lower(username) gin_trgm_ops)'
+            ))
+            db.session.execute(text(
+                'CREATE INDEX IF NOT EXISTS ix_user_phone_trgm ON "user" USING gin (phone gin_trgm_ops)'
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Trigram indexes not created: {e}")
+
+    def substring_filter(self, q):
+        return _like_filter(q)
+
+def _like_filter(q):
+    pattern = '%' + q.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    return or_(func.lower(User.username).like(pattern, escape='\\'), User.phone.like(pattern, escape='\\'))
+
+def _prefix_filter(q):
+    # Range scan on the lower(username) expression index. Phone numbers are only matched from
+    # 3 characters (trigram path): OR-ing a phone range in here stops SQLite from walking the
+    # index in order, so a popular prefix would sort every match before applying the limit.
+    low = q.lower()
+    return and_(func.lower(User.username) >= low, func.lower(User.username) < low + '\uffff')
+
+_backends = {
+    'sqlite': (SqliteMessageSearch, SqliteUserSearch),
+    'postgresql': (PostgresMessageSearch, PostgresUserSearch)
+}
+_backend = None
+_user_backend = None
+
+# Autocomplete cache for the first page of popular prefixes: (query, limit) -> (expires_at, rows)
+_autocomplete = OrderedDict()
+_autocomplete_lock = threading.Lock()
+_autocomplete_settings = {'ttl': 30, 'max_entries': 2000}
+
+def init_search(app):
+    # Must run inside an app context, after create_all()
+    global _backend, _user_backend
+    _autocomplete_settings['ttl'] = app.config.get('USER_SEARCH_CACHE_TTL', 30)
+    _autocomplete_settings['max_entries'] = app.config.get('USER_SEARCH_CACHE_SIZE', 2000)
+
+    backends = _backends.get(db.engine.dialect.name)
+    if backends is None:
+        print(f"Message search not available for {db.engine.dialect.name}")
+        return
+    _backend, _user_backend = backends[0](), backends[1]()
+    _backend.create()
+    _user_backend.create()
+
+def search_messages(user_id, q, limit=20, offset=0):
+    if _backend is None:
+        raise RuntimeError("Message search is not configured")
+    return _backend.search(user_id, q, limit, offset)
+
+def search_users(q, limit=20, after=None):
+    # Under 3 characters: prefix match on username. From 3 characters: substring match on
+    # username/phone through the trigram index. Ordered by lower(username); `after` is the last username seen.
+    q = q.strip()
+    cache_key = (q.lower(), limit)
+    if after is None:
+        cached = _autocomplete_get(cache_key)
+        if cached is not None:
+            return cached
+
+    if len(q) < 3 or _user_backend is None:
+        criteria = _prefix_filter(q) if len(q) < 3 else _like_filter(q)
+    else:
+        criteria = _user_backend.substring_filter(q)
+
+    query = USER_SUMMARY.query().filter(criteria)
+    if after is not None:
+        query = query.filter(func.lower(User.username) > after.lower())
+    rows = query.order_by(func.lower(User.username), User.id).limit(limit).all()
+
+    if after is None:
+        _autocomplete_put(cache_key, rows)
+    return rows
+
+def _autocomplete_get(key):
+    with _autocomplete_lock:
+        entry = _autocomplete.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _autocomplete[key]
+            return None
+        _autocomplete.move_to_end(key)
+        return entry[1]
+
+def _autocomplete_put(key, rows):
+    with _autocomplete_lock:
+        _autocomplete[key] = (time.monotonic() + _autocomplete_settings['ttl'], rows)
+        _autocomplete.move_to_end(key)
+        while len(_autocomplete) > _autocomplete_settings['max_entries']:
+            _autocomplete.popitem(last=False)
+
+def clear_user_search_cache():
+    with _autocomplete_lock:
+        _autocomplete.clear()
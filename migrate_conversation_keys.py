@@ -0,0 +1,46 @@
+from app import app # first: monkey-patches eventlet and builds the one app instance
+from sqlalchemy import inspect, text
+from database.db import db
+
+# One-off migration for databases created before message.conversation_key existed.
+# db.create_all() only creates missing tables, so the column, its index and the keys of
+# existing rows have to be added here. Safe to run more than once.
+BATCH_SIZE = 10000
+
+def migrate(app):
+    with app.app_context():
+        columns = {column['name'] for column in inspect(db.engine).get_columns('message')}
+        if 'conversation_key' not in columns:
+            print("Adding message.conversation_key...")
+            db.session.execute(text("ALTER TABLE message ADD COLUMN conversation_key VARCHAR(40)"))
+
+        # Replaced by ix_message_conversation_id; nothing filters on (sender, receiver, timestamp) any more
+        db.session.execute(text("DROP INDEX IF EXISTS ix_message_pair_timestamp"))
+        db.session.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_message_conversation_id ON message (conversation_key, id)"
+        ))
+        db.session.commit()
+
+        # Same format as database.models.conversation_key(): g:<group> or u:<low id>:<high id>
+        fill = text("""
+            UPDATE message SET conversation_key = CASE
+                WHEN group_id IS NOT NULL THEN 'g:' || CAST(group_id AS VARCHAR)
+                WHEN sender_id < receiver_id THEN 'u:' || CAST(sender_id AS VARCHAR) || ':' || CAST(receiver_id AS VARCHAR)
+                ELSE 'u:' || CAST(receiver_id AS VARCHAR) || ':' || CAST(sender_id AS VARCHAR)
+            END
+            WHERE conversation_key IS NULL
+              AND (group_id IS NOT NULL OR receiver_id IS NOT NULL)
+              AND id > :low AND id <= :high
+        """)
+
+        max_id = db.session.execute(text("SELECT MAX(id) FROM message")).scalar() or 0
+        updated = 0
+        # Committed in id ranges so a large table isn't locked in one long transaction
+        for low in range(0, max_id, BATCH_SIZE):
+            updated += db.session.execute(fill, {'low': low, 'high': low + BATCH_SIZE}).rowcount
+            db.session.commit()
+
+        print(f"Backfilled conversation_key for {updated} messages.")
+
+if __name__ == '__main__':
+    migrate(app)
@@ -1,31 +1,28 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, g
 from database.models import User, Message
-from database.db import db
+from database.db import db, pool_stats
 from functools import wraps
-from utils.token import decode_token
+from utils import token as token_cache
+from utils import profile_cache, last_seen, media_store, media_previews, passwords, usernames, push
+from database import ingest
+from sockets import group_fanout
+from utils.serializers import USER_DETAIL
+from utils.streaming import stream_json_array, DEFAULT_CHUNK_SIZE
 
 admin_bp = Blueprint('admin', __name__)
 
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(" ")[1]
-        
-        if not token:
+        # Token already verified by the auth middleware (utils/auth.py)
+        if not g.get('auth_token'):
             return jsonify({'message': 'Token is missing'}), 401
             
-        try:
-            payload = decode_token(token)
-            user_id = payload['sub']
-            user = User.query.get(user_id)
-            if not user or not user.is_admin:
-                return jsonify({'message': 'Admin privileges required'}), 403
-        except Exception as e:
+        user = g.get('current_user')
+        if not user:
             return jsonify({'message': 'Invalid token'}), 401
+        if not user.is_admin:
+            return jsonify({'message': 'Admin privileges required'}), 403
             
         return f(*args, **kwargs)
     return decorated_function
@@ -42,20 +39,39 @@ def dashboard():
         'active_users': active_users
     }), 200
 
+@admin_bp.route('/metrics', methods=['GET'])
+@admin_required
+def metrics():
+    return jsonify({
+        'profile_cache': profile_cache.stats(),
+        'last_seen': last_seen.stats(),
+        'message_ingest': ingest.stats(),
+        'group_fanout': group_fanout.stats(),
+        'media_previews': media_previews.stats(),
+        'db_pool': pool_stats(),
+        'token_cache': token_cache.stats(),
+        'password_hashing': passwords.stats(),
+        'username_filter': usernames.stats(),
+        'push': push.stats()
+    }), 200
+
+@admin_bp.route('/media/gc', methods=['POST'])
+@admin_required
+def media_gc():
+    # Deletes uploads that no message references after the grace period, and resumable
+    # uploads abandoned for longer than upload_hours
+    grace_hours = request.args.get('grace_hours', 24, type=int)
+    upload_hours = request.args.get('upload_hours', 24, type=int)
+    return jsonify({
+        'deleted': media_store.collect_garbage(grace_hours),
+        'expired_uploads': media_store.expire_uploads(upload_hours)
+    }), 200
+
 @admin_bp.route('/users', methods=['GET'])
 @admin_required
 def get_users():
-    users = User.query.all()
-    users_list = [{
-        'id': user.id,
-        'username': user.username,
-        'phone': user.phone,
-        'profile_picture': user.profile_picture,
-        'status': user.status,
-        'last_seen': user.last_seen.isoformat() if user.last_seen else None,
-        'is_admin': user.is_admin
-    } for user in users]
-    return jsonify(users_list), 200
+    users = USER_DETAIL.query().order_by(User.id).yield_per(DEFAULT_CHUNK_SIZE)
+    return stream_json_array(users, USER_DETAIL.dump_rows)
 
 @admin_bp.route('/users/<int:id>/status', methods=['POST'])
 @admin_required
@@ -69,6 +85,7 @@ def toggle_user_status(id):
     if new_status:
         user.status = new_status
         db.session.commit()
+        profile_cache.invalidate(id)
         return jsonify({'message': 'User status updated', 'status': user.status}), 200
     return jsonify({'message': 'Status missing'}), 400
 
@@ -82,4 +99,5 @@ def delete_user(id):
     # Optional: Delete messages too
     db.session.delete(user)
     db.session.commit()
+    profile_cache.invalidate(id)
     return jsonify({'message': 'User deleted'}), 200
@@ -1,12 +1,33 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
+from utils.passwords import hash_password, check_password, PasswordHasherBusy
+from sqlalchemy.exc import IntegrityError
 from database.db import db
 from database.models import User
 from utils.token import generate_token
 from utils.validation import validate_email, validate_password
+from utils.serializers import USER_AUTH
+from utils.usernames import is_username_available, remember_username
 
 auth_bp = Blueprint('auth', __name__)
 
+def _duplicate_error(error):
+    # Match on the violated constraint only: the full Postgres message also carries the
+    # offending value (DETAIL: Key (username)=(iphonefan)), which could name the wrong column
+    diag = getattr(error.orig, 'diag', None)
+    constraint = getattr(diag, 'constraint_name', None) or str(error.orig).splitlines()[0]
+    constraint = constraint.lower()
+    if 'user_phone_key' in constraint or 'user.phone' in constraint:
+        return 'Phone number already registered'
+    if 'user_username_key' in constraint or 'user.username' in constraint:
+        return 'Username already taken'
+    return 'User already exists'
+
+def _busy():
+    # Backpressure from the password hasher during a login storm
+    response = jsonify({'error': 'Server busy, please retry'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -16,30 +37,39 @@ def register():
     
     if not username or not phone or not password:
         return jsonify({'error': 'Missing required fields'}), 400
-        
-    if User.query.filter_by(phone=phone).first():
-        return jsonify({'error': 'Phone number already registered'}), 400
-        
-    if User.query.filter_by(username=username).first():
-        return jsonify({'error': 'Username already taken'}), 400
+
+    try:
+        password_hash = hash_password(password)
+    except PasswordHasherBusy:
+        return _busy()
 
     new_user = User(
         username=username,
         phone=phone,
-        password_hash=generate_password_hash(password)
+        password_hash=password_hash
     )
     
-    db.session.add(new_user)
-    db.session.commit()
-    
-    token = generate_token(new_user.id)
-    return jsonify({'message': 'User created successfully', 'token': token, 'user': {
-        'id': new_user.id,
-        'username': new_user.username,
-        'phone': new_user.phone,
-        'profile_picture': new_user.profile_picture,
-        'is_admin': new_user.is_admin
-    }}), 201
+    # Single INSERT: the unique constraints decide, so there is no check-then-insert race
+    try:
+        db.session.add(new_user)
+        db.session.flush()
+        user_data = USER_AUTH.dump(new_user) # Read before commit expires the instance
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        return jsonify({'error': _duplicate_error(e)}), 400
+
+    remember_username(username)
+    token = generate_token(user_data['id'])
+    return jsonify({'message': 'User created successfully', 'token': token, 'user': user_data}), 201
+
+@auth_bp.route('/username-available', methods=['GET'])
+def username_available():
+    # Sign-up UI typeahead; most answers come from the in-memory filter without a query
+    username = request.args.get('username', '').strip()
+    if not username:
+        return jsonify({'error': 'Missing required fields'}), 400
+    return jsonify({'username': username, 'available': is_username_available(username)}), 200
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
@@ -49,14 +79,13 @@ def login():
     
     user = User.query.filter_by(phone=phone).first()
     
-    if not user or not check_password_hash(user.password_hash, password):
+    try:
+        valid = bool(user) and bool(password) and check_password(user.password_hash, password)
+    except PasswordHasherBusy:
+        return _busy()
+
+    if not valid:
         return jsonify({'error': 'Invalid phone or password'}), 401
         
     token = generate_token(user.id)
-    return jsonify({'message': 'Login successful', 'token': token, 'user': {
-        'id': user.id,
-        'username': user.username,
-        'phone': user.phone,
-        'profile_picture': user.profile_picture,
-        'is_admin': user.is_admin
-    }}), 200
+    return jsonify({'message': 'Login successful', 'token': token, 'user': USER_AUTH.dump(user)}), 200
@@ -1,57 +1,56 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
+from datetime import datetime
+from sqlalchemy import and_, or_
 from database.db import db
-from database.models import Message, User, Group, GroupMember
-from sqlalchemy import or_, and_
+from database.models import Message, GroupMember, Conversation, conversation_key
+from database.inbox import record_message
+from database.search import search_messages
+from utils.loaders import load_users
+from utils.presence import get_presence
+from utils import push
+from sockets import group_fanout
+from utils.pagination import get_page_args, keyset_page
+from utils.serializers import MESSAGE, GROUP_MESSAGE, MESSAGE_SEARCH
+from utils.media_previews import attach_previews, previews_for_urls
+from utils.streaming import stream_json_array, DEFAULT_CHUNK_SIZE
 
 chat_bp = Blueprint('chat', __name__)
 
 @chat_bp.route('/history/<int:user_id>/<int:other_user_id>', methods=['GET'])
 def get_chat_history(user_id, other_user_id):
-    # Fetch messages between two users
-    messages = Message.query.filter(
-        or_(
-            and_(Message.sender_id == user_id, Message.receiver_id == other_user_id),
-            and_(Message.sender_id == other_user_id, Message.receiver_id == user_id)
-        )
-    ).order_by(Message.timestamp).all()
-    
-    result = []
-    for msg in messages:
-        result.append({
-            'id': msg.id,
-            'sender_id': msg.sender_id,
-            'receiver_id': msg.receiver_id,
-            'message': msg.message,
-            'timestamp': msg.timestamp.isoformat(),
-            'message_type': msg.message_type,
-            'media_url': msg.media_url,
-            'status': msg.status
-        })
+    # Keyset pagination: ?before_id= pages back, ?after_id= fetches newer, ?limit= caps page size
+    try:
+        before_id, after_id, limit = get_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Both directions of the thread share one conversation key, so this is a single index seek
+    query = MESSAGE.query().filter(Message.conversation_key == conversation_key(user_id, other_user_id))
+    messages = keyset_page(query, Message.id, before_id=before_id, after_id=after_id, limit=limit)
         
-    return jsonify(result)
+    return jsonify(attach_previews(MESSAGE.dump_rows(messages)))
 
 @chat_bp.route('/groups/<int:group_id>/messages', methods=['GET'])
 def get_group_messages(group_id):
-    messages = Message.query.filter_by(group_id=group_id).order_by(Message.timestamp).all()
-    result = []
-    for msg in messages:
-        sender = User.query.get(msg.sender_id)
-        result.append({
-            'id': msg.id,
-            'sender_id': msg.sender_id,
-            'sender_name': sender.username if sender else "Unknown",
-            'message': msg.message,
-            'timestamp': msg.timestamp.isoformat(),
-            'message_type': msg.message_type
-        })
-    return jsonify(result), 200
+    messages = GROUP_MESSAGE.query().filter(Message.group_id == group_id).order_by(Message.timestamp).yield_per(DEFAULT_CHUNK_SIZE)
+
+    def serialize(chunk):
+        senders = load_users(msg.sender_id for msg in chunk)
+        result = GROUP_MESSAGE.dump_rows(chunk)
+        for item in result:
+            sender = senders.get(item['sender_id'])
+            item['sender_name'] = sender.username if sender else "Unknown"
+        return result
+
+    return stream_json_array(messages, serialize)
 
 @chat_bp.route('/groups/<int:group_id>/members', methods=['GET'])
 def get_group_members(group_id):
     members = GroupMember.query.filter_by(group_id=group_id).all()
+    users = load_users(m.user_id for m in members)
     result = []
     for m in members:
-        user = User.query.get(m.user_id)
+        user = users.get(m.user_id)
         if user:
             result.append({
                 'user_id': user.id,
@@ -67,7 +66,12 @@ def remove_group_member(group_id, user_id):
     member = GroupMember.query.filter_by(group_id=group_id, user_id=user_id).first()
     if member:
         db.session.delete(member)
+        # The group also leaves their inbox
+        Conversation.query.filter_by(
+            user_id=user_id, conversation_key=conversation_key(group_id=group_id)
+        ).delete(synchronize_session=False)
         db.session.commit()
+        group_fanout.invalidate_group(group_id)
         return jsonify({'message': 'Member removed'}), 200
     return jsonify({'error': 'Member not found'}), 404
 
@@ -80,6 +84,7 @@ def update_member_role(group_id, user_id):
     if member and new_role:
         member.role = new_role
         db.session.commit()
+        group_fanout.invalidate_group(group_id)
         return jsonify({'message': 'Role updated'}), 200
     return jsonify({'error': 'Member not found or invalid role'}), 400
 
@@ -104,60 +109,105 @@ def send_message():
     )
     
     db.session.add(new_message)
+    db.session.flush()
+    record_message(new_message)
     db.session.commit()
     
-    # Emit SocketIO event
+    # Emit SocketIO event to the two participants' user rooms (joined in handle_connect),
+    # so delivery cost doesn't grow with the number of connected clients
     from extensions import socketio
-    socketio.emit('new_message', {
-        'id': new_message.id,
-        'sender_id': new_message.sender_id,
-        'receiver_id': new_message.receiver_id,
-        'message': new_message.message,
-        'timestamp': new_message.timestamp.isoformat(),
-        'message_type': new_message.message_type,
-        'media_url': new_message.media_url,
-        'status': new_message.status
-    }, room=None) # Broadcast to all for MVP, or implement rooms for scale
+    payload = attach_previews([MESSAGE.dump(new_message)])[0]
+    socketio.emit('new_message', payload, room=str(receiver_id))
+    if str(sender_id) != str(receiver_id):
+        # Keeps the sender's other devices in sync
+        socketio.emit('new_message', payload, room=str(sender_id))
+    if not get_presence().is_online(int(receiver_id)):
+        sender = load_users([sender_id]).get(int(sender_id))
+        push.notify([receiver_id], sender.username if sender else "New Message",
+                    message_content if msg_type == 'text' else 'Photo',
+                    new_message.conversation_key, {'sender_id': sender_id, 'message_id': new_message.id})
     
     return jsonify({'message': 'Message sent successfully', 'id': new_message.id}), 201
 
+def _parse_inbox_cursor(value):
+    # "<iso timestamp>,<conversation id>" -> (datetime, id); a bare timestamp gives (datetime, None)
+    if not value:
+        return None
+    timestamp, _, conv_id = value.partition(',')
+    return datetime.fromisoformat(timestamp), int(conv_id) if conv_id else None
+
 @chat_bp.route('/conversations/<int:user_id>', methods=['GET'])
 def get_conversations(user_id):
-    # Logic to fetch last message for each conversation
-    from sqlalchemy import func, case, desc
-    
-    # 1. Identify all unique pairs (user_id, other_id)
-    # This is efficiently done by finding the Max Message ID for each conversation grouping
-    
-    # Subquery to get max ID per conversation
-    # We group by the "other" user ID
-    
-    # Simplified Python-side processing for readability and reliability given SQLite limitations or complexity
-    # Fetch all messages involving user
-    all_msgs = Message.query.filter(
-        or_(Message.sender_id == user_id, Message.receiver_id == user_id)
-    ).order_by(Message.timestamp.desc()).all()
-    
-    conversations = {}
-    
-    for msg in all_msgs:
-        other_id = msg.receiver_id if msg.sender_id == user_id else msg.sender_id
-        
-        if other_id not in conversations:
-            conversations[other_id] = msg
-            
+    # Inbox is read from the materialized Conversation rows: one indexed query per page.
+    # ?before=<cursor of the last item seen> pages back, ?limit= caps page size
+    try:
+        _, _, limit = get_page_args()
+        before = _parse_inbox_cursor(request.args.get('before'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = db.session.query(Conversation, Message).join(
+        Message, Message.id == Conversation.last_message_id
+    ).filter(
+        Conversation.user_id == user_id,
+        Conversation.peer_id != None # 1-on-1 threads only
+    )
+
+    if before is not None:
+        before_timestamp, before_id = before
+        if before_id is None:
+            # Bare timestamp from older clients
+            query = query.filter(Conversation.last_timestamp < before_timestamp)
+        else:
+            # Same (last_timestamp, id) order as the page, so ties at the boundary aren't skipped
+            query = query.filter(or_(
+                Conversation.last_timestamp < before_timestamp,
+                and_(Conversation.last_timestamp == before_timestamp, Conversation.id < before_id)
+            ))
+
+    rows = query.order_by(Conversation.last_timestamp.desc(), Conversation.id.desc()).limit(limit).all()
+
+    peers = load_users(conv.peer_id for conv, _ in rows)
+    online = get_presence().online_among(peers.keys())
+    previews = previews_for_urls(msg.media_url for _, msg in rows if msg.media_url)
+
     result = []
-    for other_id, msg in conversations.items():
-        other_user = User.query.get(other_id)
-        if other_user:
-            result.append({
-                'chatId': str(other_id), # Treat userId as chatId for 1-on-1
-                'otherUserId': str(other_id),
-                'otherUserName': other_user.username,
-                'otherUserProfileUrl': other_user.profile_picture,
-                'lastMessage': msg.message if msg.message_type == 'text' else 'Photo',
-                'timestamp': msg.timestamp.isoformat(), # ISO format for frontend
-                'unreadCount': 0 # Logic for unread count requires 'status' check
-            })
+    for conv, msg in rows:
+        other_user = peers.get(conv.peer_id)
+        if not other_user:
+            continue
+        preview = previews.get(msg.media_url) or {}
+        result.append({
+            'chatId': str(other_user.id), # Treat userId as chatId for 1-on-1
+            'otherUserId': str(other_user.id),
+            'otherUserName': other_user.username,
+            'otherUserProfileUrl': other_user.profile_picture,
+            'lastMessage': msg.message if msg.message_type == 'text' else 'Photo',
+            'lastMessageThumbnailUrl': preview.get('thumbnail_url'),
+            'lastMessagePlaceholder': preview.get('placeholder'),
+            'timestamp': conv.last_timestamp.isoformat(), # ISO format for frontend
+            'unreadCount': conv.unread_count,
+            'isOnline': other_user.id in online,
+            'cursor': f"{conv.last_timestamp.isoformat()},{conv.id}" # pass back as ?before=
+        })
             
     return jsonify(result)
+
+@chat_bp.route('/search', methods=['GET'])
+def search_chat_messages():
+    # Ranked full-text search over the caller's own conversations: ?q=&limit=&offset=
+    if not g.current_user:
+        return jsonify({'message': 'Token is missing'}), 401
+
+    query = request.args.get('q', '').strip()
+    offset = request.args.get('offset', 0, type=int)
+    if not query:
+        return jsonify({'error': 'Missing required fields'}), 400
+
+    try:
+        _, _, limit = get_page_args(default_limit=20, max_limit=100)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    rows = search_messages(g.current_user.id, query, limit=limit, offset=max(offset, 0))
+    return jsonify(MESSAGE_SEARCH.dump_rows(rows))
@@ -1,15 +1,35 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, send_file, abort, Response
 from werkzeug.utils import secure_filename
+from database.db import db
+from database.models import UploadSession
+from utils import media_previews
+from utils.media_store import blob_name, find_blob, partial_path, store_file, store_stream, upload_root
+import mimetypes
 import os
+import re
+import uuid
 
 media_bp = Blueprint('media', __name__)
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp3', 'mp4', 'pdf'}
+# ab/cd/<sha256>.<ext>, optionally followed by the generated thumbnail suffix
+MEDIA_NAME = re.compile(r'^([0-9a-f]{2})/([0-9a-f]{2})/(([0-9a-f]{64})\.[a-z0-9]+)(\.thumb\.jpg)?$')
+ONE_YEAR = 365 * 24 * 3600
+STREAM_BUFFER_SIZE = 64 * 1024
 
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _extension(filename):
+    return filename.rsplit('.', 1)[1].lower()
+
+def _file_url(blob):
+    # Use request.host_url (e.g., https://.../) + media path
+    # Removing trailing slash from host_url just in case
+    base_url = request.host_url.rstrip('/')
+    return f"{base_url}/media/files/{blob_name(blob.sha256, blob.ext)}"
+
 @media_bp.route('/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
@@ -20,18 +40,147 @@ def upload_file():
         return jsonify({'error': 'No selected file'}), 400
         
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        # Ensure uploads directory exists
-        upload_folder = os.path.join(current_app.root_path, 'static', 'uploads')
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        file.save(os.path.join(upload_folder, filename))
+        # Stored by content hash, so re-uploads and forwards of the same file cost no extra bytes
+        blob, created = store_stream(file.stream, _extension(file.filename))
+        if created:
+            media_previews.schedule(blob.sha256)
         
         # Return the URL
-        # Use request.host_url (e.g., https://.../) + static path
-        # Removing trailing slash from host_url just in case
-        base_url = request.host_url.rstrip('/')
-        file_url = f"{base_url}/static/uploads/{filename}"
-        return jsonify({'message': 'File uploaded successfully', 'url': file_url}), 201
+        return jsonify({'message': 'File uploaded successfully', 'url': _file_url(blob), 'deduplicated': not created}), 201
         
     return jsonify({'error': 'File type not allowed'}), 400
+
+# --- Resumable uploads ---
+# 1. POST /uploads {filename, size[, sha256]}  -> upload_id, or the url straight away if the content is known
+# 2. PUT  /uploads/<id>?offset=N  (raw bytes)  -> new offset; repeat until offset == size
+#    GET  /uploads/<id>                        -> current offset, to resume after a disconnect
+# 3. POST /uploads/<id>/complete               -> url
+
+def _session_state(session):
+    return {
+        'upload_id': session.id,
+        'offset': session.received,
+        'size': session.size,
+        'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE']
+    }
+
+@media_bp.route('/uploads', methods=['POST'])
+def create_upload():
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('filename') or '')
+    size = data.get('size')
+
+    if not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'error': 'Missing or invalid size'}), 400
+    if size > current_app.config['MAX_UPLOAD_SIZE']:
+        return jsonify({'error': 'File too large'}), 413
+
+    if data.get('sha256'):
+        blob = find_blob(str(data['sha256']).lower())
+        if blob:
+            return jsonify({'message': 'File uploaded successfully', 'url': _file_url(blob), 'deduplicated': True}), 201
+
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=data.get('user_id'),
+        filename=filename,
+        size=size
+    )
+    open(partial_path(session.id), 'wb').close()
+    db.session.add(session)
+    db.session.commit()
+    return jsonify(_session_state(session)), 201
+
+@media_bp.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    session = UploadSession.query.get(upload_id)
+    if not session:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(_session_state(session)), 200
+
+@media_bp.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    session = UploadSession.query.get(upload_id)
+    if not session:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    offset = request.args.get('offset', type=int)
+    if offset != session.received:
+        # Client is out of sync (e.g. after a dropped connection): tell it where to resume
+        return jsonify({'error': 'Offset mismatch', 'offset': session.received}), 409
+
+    length = request.content_length
+    if length is None:
+        return jsonify({'error': 'Content-Length required'}), 411
+    if offset + length > session.size:
+        return jsonify({'error': 'Chunk exceeds declared size', 'offset': session.received}), 413
+
+    # Stream the body straight to disk with a fixed-size buffer
+    written = 0
+    try:
+        with open(partial_path(upload_id), 'r+b') as f:
+            f.seek(offset)
+            while written < length:
+                buf = request.stream.read(min(STREAM_BUFFER_SIZE, length - written))
+                if not buf:
+                    break
+                f.write(buf)
+                written += len(buf)
+    finally:
+        # Whatever made it to disk counts, so an interrupted chunk resumes where it stopped
+        session.received = offset + written
+        db.session.commit()
+
+    return jsonify(_session_state(session)), 200
+
+@media_bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    session = UploadSession.query.get(upload_id)
+    if not session:
+        return jsonify({'error': 'Upload not found'}), 404
+    if session.received != session.size:
+        return jsonify({'error': 'Upload incomplete', 'offset': session.received}), 409
+
+    blob, created = store_file(partial_path(upload_id), _extension(session.filename))
+    db.session.delete(session)
+    db.session.commit()
+    if created:
+        media_previews.schedule(blob.sha256)
+
+    return jsonify({'message': 'File uploaded successfully', 'url': _file_url(blob), 'deduplicated': not created}), 201
+
+# --- Serving ---
+
+@media_bp.route('/files/<path:name>', methods=['GET'])
+def serve_file(name):
+    # Content-addressed files never change, so they get strong ETags from their hash and
+    # immutable caching; Range requests let audio/video seek without downloading everything
+    match = MEDIA_NAME.match(name)
+    if not match or match.group(4)[:2] != match.group(1) or match.group(4)[2:4] != match.group(2):
+        abort(404)
+
+    path = os.path.join(upload_root(), name)
+    if not os.path.isfile(path):
+        abort(404)
+
+    etag = match.group(4) + ('-thumb' if match.group(5) else '')
+    mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    accel_prefix = current_app.config.get('MEDIA_ACCEL_REDIRECT_PREFIX')
+    if accel_prefix:
+        # Front proxy (nginx internal location) streams the bytes and handles Range itself
+        response = Response(status=200, mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + name
+        response.set_etag(etag)
+    else:
+        # conditional=True handles If-None-Match / If-Modified-Since and Range; the body goes
+        # out through wsgi.file_wrapper (sendfile where the server supports it), or as an
+        # X-Sendfile header when USE_X_SENDFILE is on
+        response = send_file(path, mimetype=mimetype, conditional=True, etag=etag, max_age=ONE_YEAR)
+
+    response.cache_control.public = True
+    response.cache_control.max_age = ONE_YEAR
+    response.cache_control.immutable = True
+    return response
@@ -1,24 +1,24 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from database.db import db
 from database.models import User, Call
+from utils.loaders import load_users
+from utils.streaming import stream_json_array, DEFAULT_CHUNK_SIZE
+from utils import profile_cache
+from utils.serializers import USER_DETAIL, USER_SUMMARY
+from utils.pagination import get_page_args
+from utils.usernames import remember_username
+from database import search as user_search
+from database.devices import register_device, revoke_device
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    user = User.query.get(user_id)
-    if not user:
+    row = USER_DETAIL.query().filter(User.id == user_id).first()
+    if not row:
         return jsonify({'error': 'User not found'}), 404
         
-    return jsonify({
-        'id': user.id,
-        'username': user.username,
-        'phone': user.phone,
-        'profile_picture': user.profile_picture,
-        'status': user.status,
-        'last_seen': user.last_seen.isoformat() if user.last_seen else None,
-        'is_admin': user.is_admin
-    })
+    return jsonify(USER_DETAIL.dump_row(row))
 
 @user_bp.route('/update', methods=['POST'])
 def update_user():
@@ -36,67 +36,96 @@ def update_user():
         user.profile_picture = data['profile_picture']
     if 'username' in data: # Basic rename
         user.username = data['username']
+        user_search.clear_user_search_cache()
+        remember_username(user.username)
     if 'bio' in data: # Add bio
         # Assuming User model has 'bio' field, if not need to add it. 
         # For now, let's assume it does or we add it quickly. 
         pass 
         
     db.session.commit()
+    profile_cache.invalidate(user.id)
     return jsonify({'message': 'User updated successfully'})
 
 @user_bp.route('/search', methods=['GET'])
 def search_users():
-    query = request.args.get('q', '')
+    # Typeahead: ?q=&limit=, then ?after=<last username> for the next page
+    query = request.args.get('q', '').strip()
     if not query:
         return jsonify([])
-        
-    # Simple case-insensitive search
-    users = User.query.filter(User.username.ilike(f'%{query}%')).all()
+
+    try:
+        _, _, limit = get_page_args(default_limit=20, max_limit=50)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    users = user_search.search_users(query, limit=limit, after=request.args.get('after') or None)
     
-    return jsonify([{
-        'id': user.id,
-        'username': user.username,
-        'phone': user.phone,
-        'profile_picture': user.profile_picture,
-        'status': user.status,
-        'is_admin': user.is_admin
-    } for user in users])
+    return jsonify(USER_SUMMARY.dump_rows(users))
 @user_bp.route('/calls', methods=['GET'])
 def get_calls():
-    # Simplistic token verification for now or extract from header
-    token = request.headers.get('Authorization')
-    # In real app verify token. For MVP assuming middleware or basic check
-    # user_id = verify_token(token) 
-    
-    # Temporarily hardcode user_id from query param for easy testing logic if token fails
-    # But ideally we use token. Let's trust the token logic exists or use a simple query param as fallback
-    user_id = request.args.get('user_id')
-    if not user_id and token:
-        # Simplified extract from "Bearer <id>" hack if no full JWT logic imported here 
-        try:
-            user_id = int(token.split(" ")[1]) # Debug hack
-        except:
-            pass
+    # Principal resolved from the JWT by the auth middleware; the user_id query param is only
+    # a fallback for clients that don't send a token yet
+    if g.current_user:
+        user_id = g.current_user.id
+    else:
+        user_id = request.args.get('user_id')
             
     if not user_id:
          return jsonify({'message': 'User ID missing'}), 400
          
-    calls = Call.query.filter((Call.caller_id == user_id) | (Call.receiver_id == user_id)).order_by(Call.timestamp.desc()).all()
+    calls = db.session.query(
+        Call.id, Call.caller_id, Call.receiver_id, Call.call_type, Call.status, Call.timestamp
+    ).filter((Call.caller_id == user_id) | (Call.receiver_id == user_id)).order_by(Call.timestamp.desc()).yield_per(DEFAULT_CHUNK_SIZE)
     
-    calls_data = []
-    for call in calls:
-        other_id = call.receiver_id if str(call.caller_id) == str(user_id) else call.caller_id
-        other_user = User.query.get(other_id)
+    def serialize(chunk):
+        other_ids = [call.receiver_id if str(call.caller_id) == str(user_id) else call.caller_id for call in chunk]
+        other_users = load_users(other_ids)
         
-        calls_data.append({
-            'id': call.id,
-            'other_user_id': other_id,
-            'other_user_name': other_user.username if other_user else "Unknown",
-            'other_user_pic': other_user.profile_picture if other_user else "",
-            'type': call.call_type,
-            'status': call.status,
-            'direction': 'outgoing' if str(call.caller_id) == str(user_id) else 'incoming',
-            'timestamp': call.timestamp.isoformat()
-        })
+        calls_data = []
+        for call, other_id in zip(chunk, other_ids):
+            other_user = other_users.get(other_id)
+            
+            calls_data.append({
+                'id': call.id,
+                'other_user_id': other_id,
+                'other_user_name': other_user.username if other_user else "Unknown",
+                'other_user_pic': other_user.profile_picture if other_user else "",
+                'type': call.call_type,
+                'status': call.status,
+                'direction': 'outgoing' if str(call.caller_id) == str(user_id) else 'incoming',
+                'timestamp': call.timestamp.isoformat()
+            })
+        return calls_data
         
-    return jsonify(calls_data), 200
+    return stream_json_array(calls, serialize)
+
+@user_bp.route('/devices', methods=['POST'])
+def register_device_token():
+    # Clients call this on startup and whenever FCM rotates their token. The owner always comes
+    # from the JWT: a token registered under someone else's id would receive their notifications.
+    if not g.current_user:
+        return jsonify({'message': 'Token is missing'}), 401
+
+    data = request.get_json() or {}
+    token = data.get('token')
+    if not token:
+        return jsonify({'error': 'Missing required fields'}), 400
+
+    device = register_device(g.current_user.id, token, data.get('platform'))
+    return jsonify({'message': 'Device registered', 'id': device.id}), 200
+
+@user_bp.route('/devices', methods=['DELETE'])
+def revoke_device_token():
+    # On logout; only the caller's own row is removed
+    if not g.current_user:
+        return jsonify({'message': 'Token is missing'}), 401
+
+    data = request.get_json(silent=True) or {}
+    token = data.get('token') or request.args.get('token')
+    if not token:
+        return jsonify({'error': 'Missing required fields'}), 400
+
+    if not revoke_device(token, user_id=g.current_user.id):
+        return jsonify({'error': 'Device not found'}), 404
+    return jsonify({'message': 'Device revoked'}), 200
@@ -1,11 +1,16 @@
 from flask import request
-from flask_socketio import emit, join_room, leave_room
-from app import socketio, db
-from database.models import Message, Call, User
-from utils.token import verify_token
-
-# Store active users map: user_id -> set(request_sid)
-connected_users = {}
+from flask_socketio import emit, join_room
+from extensions import socketio
+from database.db import db
+from database.models import Call, conversation_key
+from database.inbox import mark_delivered, mark_read
+from database.ingest import save_message
+from utils.auth import principal_for_token
+from utils import profile_cache
+from utils.presence import get_presence
+from utils import last_seen
+from utils import push
+from sockets import group_fanout
 
 @socketio.on('connect')
 def handle_connect():
@@ -13,70 +18,99 @@ def handle_connect():
     if not token:
         return False
         
-    user_id = verify_token(token)
-    if not user_id:
+    principal = principal_for_token(token)
+    if not principal:
         return False
+    user_id = principal.id
         
+    # Group messages are fanned out to members' user rooms too, so this is the only room needed
     join_room(str(user_id))
-    connected_users[user_id] = request.sid
+    first_session = get_presence().connect(user_id, request.sid)
     
     # Update status to online (Optional: Sync with DB)
-    emit('user_online', {'user_id': user_id}, broadcast=True)
+    if first_session:
+        last_seen.cancel(user_id)
+        emit('user_online', {'user_id': user_id}, broadcast=True)
     print(f"User {user_id} connected")
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    # Find user_id from connected_users (inefficient reverse lookup, ideally store in session)
-    user_id = None
-    for uid, sid in connected_users.items():
-        if sid == request.sid:
-            user_id = uid
-            break
+    user_id, went_offline = get_presence().disconnect(request.sid)
             
-    if user_id:
-        if user_id in connected_users:
-            del connected_users[user_id]
-        
-        # Persistence for Last Seen
-        try:
-            user = User.query.get(user_id)
-            if user:
-                user.status = "offline"
-                import datetime
-                user.last_seen = datetime.datetime.utcnow().isoformat()
-                db.session.commit()
-        except Exception as e:
-            print(f"Error updating last seen: {e}")
+    # Other devices of the same user are still connected
+    if user_id and went_offline:
+        # Persistence for Last Seen is buffered and written in batches
+        last_seen.record_offline(user_id)
             
         emit('user_offline', {'user_id': user_id}, broadcast=True)
         print(f"User {user_id} disconnected")
 
+def _advance_receipt(data, mark):
+    # The reader is the user authenticated on this socket, never a client-supplied receiver_id
+    reader_id = get_presence().user_for(request.sid)
+    sender_id = data.get('sender_id') # Who sent the messages
+    group_id = data.get('group_id')
+    up_to_id = data.get('message_id') # Optional watermark, defaults to the latest message
+
+    if not reader_id or not (sender_id or group_id):
+        return reader_id, None
+
+    if group_id:
+        key, peer_id = conversation_key(group_id=group_id), None
+    else:
+        key, peer_id = conversation_key(reader_id, sender_id), int(sender_id)
+
+    up_to = mark(reader_id, key, peer_id=peer_id, up_to_id=up_to_id)
+    db.session.commit()
+    return reader_id, up_to
+
+@socketio.on('mark_delivered')
+def handle_mark_delivered(data):
+    receiver_id, up_to = _advance_receipt(data, mark_delivered)
+    if up_to and not data.get('group_id'):
+        emit('messages_delivered', {
+            'receiver_id': receiver_id,
+            'sender_id': data.get('sender_id'),
+            'up_to_id': up_to
+        }, room=str(data.get('sender_id')))
+
 @socketio.on('mark_read')
 def handle_mark_read(data):
     sender_id = data.get('sender_id') # Who sent the message (that is now read)
-    receiver_id = data.get('receiver_id') # Who read it (current user)
     
-    # In a real app, update DB status for all messages from sender to receiver as 'read'
-    # db.session.query(Message).filter(...)
+    reader_id, up_to = _advance_receipt(data, mark_read)
     
-    emit('messages_read', {
-        'reader_id': receiver_id,
-        'sender_id': sender_id
-    }, room=str(sender_id))
+    if reader_id and sender_id and not data.get('group_id'):
+        emit('messages_read', {
+            'reader_id': reader_id,
+            'sender_id': sender_id,
+            'up_to_id': up_to
+        }, room=str(sender_id))
 
 @socketio.on('send_message')
 def handle_message(data):
-    sender_id = data.get('sender_id')
+    # Sender is the user authenticated on this socket, never the client-supplied sender_id
+    sender_id = get_presence().user_for(request.sid)
     receiver_id = data.get('receiver_id')
     group_id = data.get('group_id')
     message = data.get('message')
+
+    if not sender_id:
+        return {'error': 'Not authenticated'}
+    # Exactly one recipient: a user or a group
+    if bool(receiver_id) == bool(group_id):
+        return {'error': 'Missing required fields'}
+    if group_id and not group_fanout.is_member(group_id, sender_id):
+        return {'error': 'Not a member of this group'}
     
-    # Save to DB
-    new_msg = Message(sender_id=sender_id, receiver_id=receiver_id, group_id=group_id, message=message, message_type='text')
-    db.session.add(new_msg)
-    db.session.commit()
+    # Save to DB (group-committed with concurrent messages when MESSAGE_GROUP_COMMIT is on)
+    try:
+        new_msg = save_message(sender_id=sender_id, receiver_id=receiver_id, group_id=group_id, message=message, message_type='text')
+    except Exception as e:
+        print(f"Error saving message: {e}")
+        return {'error': 'Message could not be saved'}
     
-    sender_user = User.query.get(sender_id)
+    sender_user = profile_cache.get_profile(sender_id)
     sender_name = sender_user.username if sender_user else "Unknown"
 
     response_data = {
@@ -89,25 +123,29 @@ def handle_message(data):
     }
 
     if group_id:
-        emit('new_group_message', response_data, room=f"group_{group_id}")
+        # Delivered to every online member's own room, so members needn't re-join after reconnect
+        offline = group_fanout.fan_out(group_id, 'new_group_message', response_data)
+        push.notify([uid for uid in offline if uid != sender_id], sender_name, message,
+                    conversation_key(group_id=group_id), {'group_id': group_id, 'message_id': new_msg.id})
     else:
         emit('new_message', response_data, room=str(receiver_id))
+        if not get_presence().is_online(int(receiver_id)):
+            # Queued for the push dispatcher; bursts from the same chat collapse into one notification
+            push.notify([receiver_id], sender_name, message,
+                        conversation_key(sender_id, receiver_id), {'sender_id': sender_id, 'message_id': new_msg.id})
+
+    # Acknowledgement for clients that pass a callback
+    return {'id': new_msg.id}
 
 @socketio.on('join_group')
 def handle_join_group(data):
     group_id = data.get('group_id')
-    if group_id:
-        join_room(f"group_{group_id}")
-        print(f"User joined group_{group_id}")
-    
-    # Push Notification (Stub)
-    # In a real app, fetch receiver's FCM token from DB
-    from utils.fcm import send_push_notification
-    # receiver = User.query.get(receiver_id)
-    # if receiver and receiver.fcm_token:
-    #     send_push_notification(receiver.fcm_token, "New Message", message)
-    
-    # Emit acknowledgment back to sender (optional)
+    user_id = get_presence().user_for(request.sid)
+    if not group_id or not user_id or not group_fanout.is_member(group_id, user_id):
+        return {'error': 'Not a member of this group'}
+
+    # No room to join: fan_out delivers to the user room joined on connect. Kept as a
+    # membership check and acknowledgement for clients that still call it.
     emit('group_joined', {'group_id': group_id}, room=request.sid)
 
 @socketio.on('typing')
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+from database.models import GroupMember
+from extensions import socketio
+from utils.presence import get_presence
+
+# group_id -> (expires_at, {user_id: role}); invalidated explicitly on membership changes
+_members = OrderedDict()
+_lock = threading.Lock()
+_settings = {'ttl': 60, 'max_groups': 10000, 'chunk_size': 500}
+_stats = {'hits': 0, 'misses': 0, 'fanouts': 0, 'deliveries': 0}
+
+def init_group_fanout(app):
+    _settings['ttl'] = app.config.get('GROUP_MEMBER_CACHE_TTL', 60)
+    _settings['max_groups'] = app.config.get('GROUP_MEMBER_CACHE_SIZE', 10000)
+    _settings['chunk_size'] = app.config.get('GROUP_FANOUT_CHUNK_SIZE', 500)
+
+def group_members(group_id):
+    # Returns {user_id: role} for the group, from cache when possible
+    group_id = int(group_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _members.get(group_id)
+        if entry and entry[0] > now:
+            _members.move_to_end(group_id)
+            _stats['hits'] += 1
+            return entry[1]
+
+    _stats['misses'] += 1
+    members = {uid: role for uid, role in GroupMember.query.with_entities(
+        GroupMember.user_id, GroupMember.role
+    ).filter_by(group_id=group_id)}
+
+    with _lock:
+        _members[group_id] = (now + _settings['ttl'], members)
+        _members.move_to_end(group_id)
+        while len(_members) > _settings['max_groups']:
+            _members.popitem(last=False)
+    return members
+
+def is_member(group_id, user_id):
+    if int(user_id) in group_members(group_id):
+        return True
+    # The cache may predate a join; check the database once before refusing
+    invalidate_group(group_id)
+    return int(user_id) in group_members(group_id)
+
+def invalidate_group(group_id):
+    with _lock:
+        _members.pop(int(group_id), None)
+
+def fan_out(group_id, event, payload):
+    # Emits to each online member's user room in chunks, yielding to the event loop between
+    # chunks so a 10k-member group doesn't stall other sockets. Returns the offline member ids
+    # (candidates for push notifications).
+    members = group_members(group_id)
+    online = get_presence().online_among(members.keys())
+    recipients = list(online)
+    chunk_size = _settings['chunk_size']
+
+    for start in range(0, len(recipients), chunk_size):
+        for uid in recipients[start:start + chunk_size]:
+            socketio.emit(event, payload, room=str(uid))
+        socketio.sleep(0)
+
+    _stats['fanouts'] += 1
+    _stats['deliveries'] += len(recipients)
+    return [uid for uid in members if uid not in online]
+
+def stats():
+    result = dict(_stats)
+    result['cached_groups'] = len(_members)
+    return result
@@ -0,0 +1,93 @@
+import os
+import sys
+import tempfile
+
+# Config is read at import time, so the environment has to be set before the app is imported
+_db_dir = tempfile.mkdtemp(prefix='chatapp-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault('SECRET_KEY', 'test-secret')
+os.environ['PUSH_TRANSPORT'] = 'fake'
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+os.environ.pop('REDIS_URL', None)
+os.environ.pop('SOCKETIO_MESSAGE_QUEUE', None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import event
+from app import app as flask_app
+from database import search
+from database.db import db
+from database.models import User
+from sockets import group_fanout
+from utils import profile_cache, push, token, usernames
+from utils import presence as presence_module
+from utils.token import generate_token
+
+@pytest.fixture
+def app():
+    yield flask_app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture(autouse=True)
+def clean_state(app):
+    # Every test starts from empty tables and cold caches
+    yield
+    with app.app_context():
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+    profile_cache.init_profile_cache(app)
+    presence_module.init_presence(app)
+    token.init_tokens(app)
+    search.clear_user_search_cache()
+    usernames._filter = None
+    with group_fanout._lock:
+        group_fanout._members.clear()
+    with push._lock:
+        push._pending.clear()
+        push._retries.clear()
+
+@pytest.fixture
+def make_user(app):
+    counter = {'n': 0}
+
+    def make(username=None, **fields):
+        counter['n'] += 1
+        user = User(
+            username=username or f"user{counter['n']}",
+            phone=fields.pop('phone', f"+1555{counter['n']:07d}"),
+            password_hash=fields.pop('password_hash', 'x'),
+            **fields
+        )
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+    with app.app_context():
+        yield make
+
+@pytest.fixture
+def auth_headers():
+    def headers(user_id):
+        return {'Authorization': f"Bearer {generate_token(user_id)}"}
+    return headers
+
+@pytest.fixture
+def count_queries(app):
+    # Usage: with count_queries() as queries: ...; len(queries) is the number of statements run
+    class Counter(list):
+        def __enter__(self):
+            event.listen(db.engine, 'before_cursor_execute', self._record)
+            return self
+
+        def __exit__(self, *exc):
+            event.remove(db.engine, 'before_cursor_execute', self._record)
+
+        def _record(self, conn, cursor, statement, parameters, context, executemany):
+            self.append(statement)
+
+    with app.app_context():
+        yield Counter
@@ -0,0 +1,51 @@
+import datetime
+import jwt
+from database.db import db
+from database.models import Call
+from utils import token
+from utils.token import generate_token, verify_token
+
+def test_admin_routes_check_the_principal(client, make_user, auth_headers):
+    admin, member = make_user(is_admin=True), make_user()
+
+    assert client.get('/admin/dashboard').status_code == 401
+    assert client.get('/admin/dashboard', headers={'Authorization': 'Bearer not-a-jwt'}).status_code == 401
+    assert client.get('/admin/dashboard', headers=auth_headers(member)).status_code == 403
+    assert client.get('/admin/dashboard', headers=auth_headers(admin)).status_code == 200
+
+def test_verified_tokens_are_cached(app, make_user):
+    uid = make_user()
+    jwt_token = generate_token(uid)
+    before = token.stats()
+
+    assert verify_token(jwt_token) == uid
+    assert verify_token(jwt_token) == uid
+
+    after = token.stats()
+    assert after['misses'] - before['misses'] == 1
+    assert after['hits'] - before['hits'] == 1
+
+def test_cache_entries_do_not_outlive_the_token(app, make_user, monkeypatch):
+    uid = make_user()
+    exp = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=30)
+    jwt_token = jwt.encode({'user_id': uid, 'exp': exp}, token._secret, algorithm='HS256')
+    verify_token(jwt_token)
+    misses = token.stats()['misses']
+
+    # Past exp the cached entry is dropped and the token goes back through jwt.decode
+    monkeypatch.setattr(token.time, 'time', lambda: exp.timestamp() + 1)
+    verify_token(jwt_token)
+    assert token.stats()['misses'] == misses + 1
+
+def test_tokens_signed_with_another_key_are_rejected(app, make_user):
+    forged = jwt.encode({'user_id': make_user()}, 'wrong-key', algorithm='HS256')
+    assert verify_token(forged) is None
+
+def test_call_log_belongs_to_the_authenticated_caller(client, make_user, auth_headers):
+    alice, bob, carol = make_user(), make_user(), make_user()
+    db.session.add(Call(caller_id=bob, receiver_id=carol, call_type='voice', status='ended'))
+    db.session.commit()
+
+    # An authenticated caller can't read someone else's log through ?user_id=
+    assert client.get(f'/user/calls?user_id={bob}', headers=auth_headers(alice)).get_json() == []
+    assert len(client.get('/user/calls', headers=auth_headers(bob)).get_json()) == 1
@@ -0,0 +1,60 @@
+import time
+from database.devices import prune_tokens, register_device, revoke_device, tokens_for
+from database.models import DeviceToken
+from utils import push
+
+def _register(client, headers, token, platform=None):
+    return client.post('/user/devices', json={'token': token, 'platform': platform}, headers=headers)
+
+def test_register_requires_a_token(client):
+    assert client.post('/user/devices', json={'token': 'abc'}).status_code == 401
+
+def test_reregistering_refreshes_or_moves_the_token(app, client, make_user, auth_headers):
+    alice, bob = make_user(), make_user()
+    first = _register(client, auth_headers(alice), 'tok-a', 'ios').get_json()['id']
+    again = _register(client, auth_headers(alice), 'tok-a').get_json()['id']
+    assert again == first
+
+    # Same device, new login: the token follows the account that registered it last
+    moved = _register(client, auth_headers(bob), 'tok-a').get_json()['id']
+    assert moved == first
+    device = DeviceToken.query.one()
+    assert (device.user_id, device.platform) == (bob, 'ios')
+
+def test_revoke_only_removes_the_callers_token(app, client, make_user, auth_headers):
+    alice, bob = make_user(), make_user()
+    register_device(alice, 'tok-a')
+
+    assert client.delete('/user/devices?token=tok-a', headers=auth_headers(bob)).status_code == 404
+    assert tokens_for([alice]) == {alice: ['tok-a']}
+
+    assert client.delete('/user/devices', json={'token': 'tok-a'}, headers=auth_headers(alice)).status_code == 200
+    assert tokens_for([alice]) == {}
+    assert revoke_device('tok-a') is False
+
+def test_tokens_for_groups_devices_by_user(app, make_user):
+    alice, bob, carol = make_user(), make_user(), make_user()
+    for user_id, token in ((alice, 'a-phone'), (alice, 'a-laptop'), (bob, 'b-phone')):
+        register_device(user_id, token)
+
+    result = tokens_for([alice, bob, carol])
+
+    assert sorted(result[alice]) == ['a-laptop', 'a-phone']
+    assert result[bob] == ['b-phone']
+    assert carol not in result
+    assert tokens_for([]) == {}
+
+def test_dispatcher_prunes_unregistered_tokens(app, make_user, monkeypatch):
+    alice = make_user()
+    register_device(alice, 'a-old')
+    register_device(alice, 'a-new')
+    fake = push.FakeTransport(failures={'a-old': 'UNREGISTERED'})
+    monkeypatch.setattr(push, '_transport', fake)
+    monkeypatch.setattr(push, '_ensure_started', lambda: None)
+
+    push.notify([alice], 'bob', 'hi', 'u:1:2')
+    push.dispatch(now=time.monotonic() + 10 ** 6)
+
+    assert sorted(fake.sent[0]['tokens']) == ['a-new', 'a-old']
+    assert tokens_for([alice]) == {alice: ['a-new']}
+    assert prune_tokens([]) == 0
@@ -0,0 +1,61 @@
+from database.db import db
+from database.models import Group, GroupMember, Message
+from extensions import socketio
+from sockets import group_fanout
+from utils import push
+from utils.token import generate_token
+
+def _group(creator, *members):
+    group = Group(name='g', created_by=creator)
+    db.session.add(group)
+    db.session.flush()
+    db.session.add_all([GroupMember(group_id=group.id, user_id=uid) for uid in (creator,) + members])
+    db.session.commit()
+    return group.id
+
+def _connect(app, user_id):
+    sock = socketio.test_client(app, query_string=f"token={generate_token(user_id)}")
+    sock.get_received()
+    return sock
+
+def _events(sock, name):
+    return [e['args'][0] for e in sock.get_received() if e['name'] == name]
+
+def test_group_message_reaches_online_members(app, make_user):
+    alice, bob, outsider = make_user(), make_user(), make_user()
+    group_id = _group(alice, bob)
+    sockets = {uid: _connect(app, uid) for uid in (alice, bob, outsider)}
+
+    ack = sockets[alice].emit('send_message', {'group_id': group_id, 'message': 'hello'}, callback=True)
+
+    assert 'id' in ack
+    assert [e['message'] for e in _events(sockets[bob], 'new_group_message')] == ['hello']
+    assert _events(sockets[outsider], 'new_group_message') == []
+
+def test_sender_comes_from_the_socket_not_the_payload(app, make_user):
+    alice, bob, mallory = make_user(), make_user(), make_user()
+    group_id = _group(alice, bob)
+    sock = _connect(app, mallory)
+
+    ack = sock.emit('send_message', {'group_id': group_id, 'sender_id': alice, 'message': 'spoof'}, callback=True)
+
+    assert ack == {'error': 'Not a member of this group'}
+    assert Message.query.count() == 0
+
+def test_offline_members_are_queued_for_push(app, make_user):
+    alice, bob = make_user(), make_user()
+    group_id = _group(alice, bob)
+    sock = _connect(app, alice)
+
+    sock.emit('send_message', {'group_id': group_id, 'message': 'ping'}, callback=True)
+
+    assert (bob, f"g:{group_id}") in push._pending
+    assert (alice, f"g:{group_id}") not in push._pending
+
+def test_member_cache_is_invalidated_on_removal(app, client, make_user):
+    alice, bob = make_user(), make_user()
+    group_id = _group(alice, bob)
+    assert group_fanout.is_member(group_id, bob)
+
+    assert client.delete(f"/chat/groups/{group_id}/members/{bob}").status_code == 200
+    assert bob not in group_fanout.group_members(group_id)
@@ -0,0 +1,43 @@
+from database import inbox
+from database.db import db
+from database.ingest import save_message
+from database.models import Conversation, Group, GroupMember, conversation_key
+
+def _send(sender, receiver=None, group_id=None):
+    return save_message(sender_id=sender, receiver_id=receiver, group_id=group_id, message='hi', message_type='text').id
+
+def test_row_created_by_a_concurrent_writer_is_updated(app, make_user):
+    alice, bob = make_user(), make_user()
+    key = conversation_key(alice, bob)
+    # Another worker's first message in the thread committed its inbox row in between
+    with db.engine.begin() as conn:
+        conn.execute(Conversation.__table__.insert(), [
+            {'user_id': bob, 'conversation_key': key, 'peer_id': alice, 'unread_count': 1}
+        ])
+
+    message_id = _send(alice, bob)
+
+    db.session.expire_all()
+    bob_row = Conversation.query.filter_by(user_id=bob, conversation_key=key).one()
+    alice_row = Conversation.query.filter_by(user_id=alice, conversation_key=key).one()
+    assert (bob_row.last_message_id, bob_row.unread_count) == (message_id, 2)
+    assert (alice_row.last_message_id, alice_row.unread_count) == (message_id, 0)
+
+def test_large_groups_are_written_in_chunks(app, make_user, monkeypatch):
+    monkeypatch.setattr(inbox, 'UPSERT_CHUNK_SIZE', 2)
+    members = [make_user() for _ in range(5)]
+    group = Group(name='g', created_by=members[0])
+    db.session.add(group)
+    db.session.flush()
+    db.session.add_all([GroupMember(group_id=group.id, user_id=uid) for uid in members])
+    db.session.commit()
+    group_id = group.id
+
+    _send(members[0], group_id=group_id)
+    last_id = _send(members[1], group_id=group_id)
+
+    db.session.expire_all()
+    rows = {row.user_id: row for row in Conversation.query.filter_by(conversation_key=f"g:{group_id}")}
+    assert sorted(rows) == sorted(members)
+    assert {row.last_message_id for row in rows.values()} == {last_id}
+    assert [rows[uid].unread_count for uid in members] == [1, 1, 2, 2, 2]
@@ -0,0 +1,47 @@
+import eventlet
+import pytest
+from database import ingest
+from database.models import Conversation, Message
+
+@pytest.fixture
+def group_commit():
+    ingest._settings['group_commit'] = True
+    yield
+    ingest._settings['group_commit'] = False
+
+def test_direct_save_writes_message_and_inbox(app, make_user):
+    alice, bob = make_user(), make_user()
+    stored = ingest.save_message(sender_id=alice, receiver_id=bob, message='hi', message_type='text')
+    assert Message.query.get(stored.id).message == 'hi'
+    assert Conversation.query.filter_by(user_id=bob).one().unread_count == 1
+
+def test_group_commit_batches_concurrent_senders(app, make_user, group_commit):
+    alice, bob = make_user(), make_user()
+    before = ingest.stats()['batches']
+
+    def send(i):
+        with app.app_context():
+            return ingest.save_message(sender_id=alice, receiver_id=bob, message=f"m{i}", message_type='text').id
+
+    pool = eventlet.GreenPool()
+    ids = list(pool.imap(send, range(50)))
+
+    assert len(set(ids)) == 50
+    assert Message.query.count() == 50
+    assert ingest.stats()['batches'] - before < 50
+    assert Conversation.query.filter_by(user_id=bob).one().unread_count == 50
+
+def test_group_commit_isolates_a_failing_row(app, make_user, group_commit):
+    alice, bob = make_user(), make_user()
+
+    def send(message):
+        with app.app_context():
+            try:
+                return ingest.save_message(sender_id=alice, receiver_id=bob, message=message, message_type='text').id
+            except Exception:
+                return None
+
+    pool = eventlet.GreenPool()
+    results = list(pool.imap(send, ['ok', None, 'also ok'])) # message is NOT NULL
+    assert results[1] is None
+    assert results[0] and results[2]
@@ -0,0 +1,29 @@
+from database.db import db
+from database.models import User
+from utils import last_seen
+
+def test_flush_writes_status_and_last_seen(app, make_user):
+    uid = make_user(status='online')
+    last_seen.record_offline(uid)
+
+    assert last_seen.flush() == 1
+
+    db.session.expire_all()
+    user = db.session.get(User, uid)
+    assert user.status == 'offline' and user.last_seen is not None
+    assert last_seen.stats()['pending'] == 0
+
+def test_deleted_user_does_not_block_the_batch(app, make_user):
+    gone, kept = make_user(status='online'), make_user(status='online')
+    last_seen.record_offline(gone)
+    last_seen.record_offline(kept)
+    db.session.delete(db.session.get(User, gone))
+    db.session.commit()
+    errors = last_seen.stats()['errors']
+
+    assert last_seen.flush() == 2
+
+    db.session.expire_all()
+    assert db.session.get(User, kept).status == 'offline'
+    assert last_seen.stats()['errors'] == errors
+    assert last_seen.stats()['pending'] == 0
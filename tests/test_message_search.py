@@ -0,0 +1,60 @@
+from database.db import db
+from database.ingest import save_message
+from database.models import Conversation, Group, GroupMember
+
+def _send(sender, receiver=None, group_id=None, text=''):
+    return save_message(sender_id=sender, receiver_id=receiver, group_id=group_id, message=text, message_type='text').id
+
+def test_search_requires_a_token(client):
+    assert client.get('/chat/search?q=hello').status_code == 401
+
+def test_search_is_scoped_to_the_callers_conversations(app, client, make_user, auth_headers):
+    alice, bob, carol, dave = (make_user() for _ in range(4))
+    mine = _send(alice, bob, text='hello bob')
+    _send(carol, dave, text='hello dave')
+
+    # user_id in the query string is ignored: the principal comes from the token
+    response = client.get(f'/chat/search?q=hello&user_id={carol}', headers=auth_headers(alice))
+
+    assert response.status_code == 200
+    assert [hit['id'] for hit in response.get_json()] == [mine]
+
+def test_group_messages_are_visible_to_members(app, client, make_user, auth_headers):
+    alice, bob, outsider = make_user(), make_user(), make_user()
+    group = Group(name='g', created_by=alice)
+    db.session.add(group)
+    db.session.flush()
+    db.session.add_all([GroupMember(group_id=group.id, user_id=uid) for uid in (alice, bob)])
+    db.session.commit()
+    message_id = _send(alice, group_id=group.id, text='standup notes')
+
+    assert [h['id'] for h in client.get('/chat/search?q=standup', headers=auth_headers(bob)).get_json()] == [message_id]
+    assert client.get('/chat/search?q=standup', headers=auth_headers(outsider)).get_json() == []
+
+def test_prefix_matching_and_paging(app, client, make_user, auth_headers):
+    alice, bob = make_user(), make_user()
+    ids = [_send(alice, bob, text=f"deployment {i}") for i in range(5)]
+
+    first = client.get('/chat/search?q=deploy&limit=3', headers=auth_headers(alice)).get_json()
+    second = client.get('/chat/search?q=deploy&limit=3&offset=3', headers=auth_headers(alice)).get_json()
+
+    assert len(first) == 3 and len(second) == 2
+    assert sorted(h['id'] for h in first + second) == ids
+    assert set(first[0]) == {'id', 'sender_id', 'receiver_id', 'group_id', 'message', 'message_type', 'timestamp'}
+
+def test_removed_member_loses_group_access(app, client, make_user, auth_headers):
+    alice, bob = make_user(), make_user()
+    group = Group(name='g', created_by=alice)
+    db.session.add(group)
+    db.session.flush()
+    db.session.add_all([GroupMember(group_id=group.id, user_id=uid) for uid in (alice, bob)])
+    db.session.commit()
+    group_id = group.id
+    _send(alice, group_id=group_id, text='roadmap draft')
+
+    assert client.delete(f"/chat/groups/{group_id}/members/{bob}").status_code == 200
+    _send(alice, group_id=group_id, text='roadmap final')
+
+    assert client.get('/chat/search?q=roadmap', headers=auth_headers(bob)).get_json() == []
+    assert Conversation.query.filter_by(user_id=bob, conversation_key=f"g:{group_id}").count() == 0
+    assert len(client.get('/chat/search?q=roadmap', headers=auth_headers(alice)).get_json()) == 2
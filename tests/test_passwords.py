@@ -0,0 +1,28 @@
+import threading
+import pytest
+from utils import passwords
+
+def test_register_then_login(client):
+    registered = client.post('/auth/register', json={'username': 'alice', 'phone': '+1555', 'password': 'pw123456'})
+    assert registered.status_code == 201
+
+    assert client.post('/auth/login', json={'phone': '+1555', 'password': 'pw123456'}).status_code == 200
+    assert client.post('/auth/login', json={'phone': '+1555', 'password': 'wrong'}).status_code == 401
+
+def test_configured_hash_method_is_used(app):
+    assert passwords.hash_password('pw').startswith(app.config['PASSWORD_HASH_METHOD'] + '$')
+
+@pytest.fixture
+def saturated(monkeypatch):
+    # Every slot taken and no queueing allowed
+    monkeypatch.setattr(passwords, '_slots', threading.BoundedSemaphore(1))
+    monkeypatch.setitem(passwords._settings, 'queue_timeout', 0.01)
+    passwords._slots.acquire()
+    yield
+    passwords._slots.release()
+
+def test_login_storm_gets_503_with_retry_after(client, make_user, saturated):
+    make_user(phone='+1777')
+    response = client.post('/auth/login', json={'phone': '+1777', 'password': 'pw'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
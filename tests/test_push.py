@@ -0,0 +1,97 @@
+import time
+import pytest
+from utils import push
+
+LATER = 10 ** 6 # seconds; past every coalescing window and backoff
+
+@pytest.fixture
+def transport(monkeypatch):
+    # Fresh fake transport and counters; tokens are 'tok-<user_id>' unless a test overrides them
+    fake = push.FakeTransport()
+    monkeypatch.setattr(push, '_transport', fake)
+    monkeypatch.setattr(push, '_stats', dict.fromkeys(push._stats, 0))
+    monkeypatch.setattr(push, '_ensure_started', lambda: None)
+    monkeypatch.setattr(push, '_token_resolver', lambda user_ids: {uid: [f"tok-{uid}"] for uid in user_ids})
+    pruned = []
+    monkeypatch.setattr(push, '_invalid_token_handler', pruned.extend)
+    fake.pruned = pruned
+    return fake
+
+def _later():
+    return time.monotonic() + LATER
+
+def test_burst_from_one_chat_is_coalesced(transport):
+    for text in ('one', 'two', 'three'):
+        push.notify([7], 'alice', text, 'u:1:7', {'message_id': text})
+
+    push.dispatch(now=time.monotonic()) # still inside the window
+    assert transport.sent == []
+
+    push.dispatch(now=_later())
+    assert len(transport.sent) == 1
+    assert transport.sent[0]['body'] == '3 new messages'
+    assert transport.sent[0]['data'] == {'message_id': 'three', 'chat_key': 'u:1:7'}
+    assert push.stats()['coalesced'] == 2
+
+def test_identical_notifications_share_multicasts_up_to_batch_size(transport, monkeypatch):
+    monkeypatch.setitem(push._settings, 'batch_size', 2)
+    push.notify([1, 2, 3, 4, 5], 'team', 'standup', 'g:9')
+    push.notify([6], 'bob', 'different body', 'u:6:8')
+
+    push.dispatch(now=_later())
+
+    sizes = sorted(len(batch['tokens']) for batch in transport.sent if batch['body'] == 'standup')
+    assert sizes == [1, 2, 2]
+    assert [b['tokens'] for b in transport.sent if b['body'] == 'different body'] == [['tok-6']]
+
+def test_retryable_errors_back_off_then_give_up(transport, monkeypatch):
+    monkeypatch.setitem(push._settings, 'max_retries', 2)
+    monkeypatch.setitem(push._settings, 'retry_base', 10.0)
+    transport.failures['tok-1'] = 'UNAVAILABLE'
+    push.notify([1, 2], 'team', 'hi', 'g:1')
+
+    started = time.monotonic()
+    push.dispatch(now=_later())
+    assert [b['tokens'] for b in transport.sent] == [['tok-1', 'tok-2']]
+    # Only the failed token is retried, after retry_base * 2^(attempt-1)
+    assert [(r['tokens'], r['attempt']) for r in push._retries] == [(['tok-1'], 1)]
+    assert push._retries[0]['due_at'] - started == pytest.approx(10.0, abs=1.0)
+
+    push.dispatch(now=time.monotonic()) # not due yet
+    assert len(transport.sent) == 1
+
+    push.dispatch(now=_later())
+    assert push._retries[0]['due_at'] - time.monotonic() == pytest.approx(20.0, abs=1.0)
+    push.dispatch(now=_later())
+
+    assert [b['tokens'] for b in transport.sent] == [['tok-1', 'tok-2'], ['tok-1'], ['tok-1']]
+    assert push._retries == []
+    assert push.stats()['failed'] == 1 and push.stats()['delivered'] == 1
+
+def test_unregistered_tokens_are_pruned(transport):
+    transport.failures['tok-1'] = 'UNREGISTERED'
+    push.notify([1], 'alice', 'hi', 'u:1:2')
+
+    push.dispatch(now=_later())
+
+    assert transport.pruned == ['tok-1']
+    assert push.stats()['invalid_tokens'] == 1
+
+def test_invalid_argument_prunes_only_when_the_payload_got_through(transport):
+    transport.failures.update({'tok-1': 'INVALID_ARGUMENT', 'tok-2': 'INVALID_ARGUMENT'})
+    push.notify([1, 2], 'team', 'everyone failed', 'g:1')
+    push.dispatch(now=_later())
+    # Nothing was delivered, so the payload may be at fault: keep the tokens
+    assert transport.pruned == []
+
+    push.notify([1, 3], 'team', 'one delivered', 'g:2')
+    push.dispatch(now=_later())
+    assert transport.pruned == ['tok-1']
+
+def test_long_bodies_are_truncated(transport, monkeypatch):
+    monkeypatch.setitem(push._settings, 'body_length', 10)
+    push.notify([1], 'alice', 'x' * 100, 'u:1:2')
+
+    push.dispatch(now=_later())
+
+    assert transport.sent[0]['body'] == 'x' * 9 + '\u2026'
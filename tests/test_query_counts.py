@@ -0,0 +1,60 @@
+import pytest
+from database.db import db
+from database.models import Call, Group, GroupMember, Message
+from utils import profile_cache
+
+# Each endpoint must run the same number of statements whatever the result size (no N+1)
+SIZES = (3, 30)
+
+def _seed_group(make_user, size):
+    owner = make_user()
+    group = Group(name='g', created_by=owner)
+    db.session.add(group)
+    db.session.flush()
+    for _ in range(size):
+        member = make_user()
+        db.session.add(GroupMember(group_id=group.id, user_id=member))
+        db.session.add(Message(sender_id=member, group_id=group.id, message='hi'))
+    db.session.commit()
+    return group.id
+
+def _seed_calls(make_user, size):
+    me = make_user()
+    for i in range(size):
+        other = make_user()
+        caller, receiver = (me, other) if i % 2 else (other, me)
+        db.session.add(Call(caller_id=caller, receiver_id=receiver, call_type='voice', status='missed'))
+    db.session.commit()
+    return me
+
+def _statements(app, count_queries, url):
+    # Cold profile cache, so user lookups are part of the count
+    profile_cache.init_profile_cache(app)
+    client = app.test_client()
+    with count_queries() as queries:
+        response = client.get(url)
+        response.get_data()
+    assert response.status_code == 200
+    return len(queries)
+
+def _clear():
+    for table in reversed(db.metadata.sorted_tables):
+        db.session.execute(table.delete())
+    db.session.commit()
+
+@pytest.mark.parametrize('path', ['messages', 'members'])
+def test_group_endpoints_run_constant_queries(app, make_user, count_queries, path):
+    counts = []
+    for size in SIZES:
+        group_id = _seed_group(make_user, size)
+        counts.append(_statements(app, count_queries, f"/chat/groups/{group_id}/{path}"))
+        _clear()
+    assert counts[0] == counts[1]
+
+def test_calls_run_constant_queries(app, make_user, count_queries):
+    counts = []
+    for size in SIZES:
+        me = _seed_calls(make_user, size)
+        counts.append(_statements(app, count_queries, f"/user/calls?user_id={me}"))
+        _clear()
+    assert counts[0] == counts[1]
@@ -0,0 +1,60 @@
+from database.db import db
+from database.ingest import save_message
+from database.models import Conversation, Message, conversation_key
+from extensions import socketio
+from utils.token import generate_token
+
+def _connect(app, user_id):
+    sock = socketio.test_client(app, query_string=f"token={generate_token(user_id)}")
+    sock.get_received()
+    return sock
+
+def _send(sender, receiver, text='hi'):
+    return save_message(sender_id=sender, receiver_id=receiver, message=text, message_type='text').id
+
+def _inbox(user_id, other_id):
+    db.session.expire_all()
+    return Conversation.query.filter_by(user_id=user_id, conversation_key=conversation_key(user_id, other_id)).one()
+
+def _statuses(ids):
+    db.session.expire_all()
+    return [db.session.get(Message, mid).status for mid in ids]
+
+def test_mark_delivered_moves_the_watermark(app, make_user):
+    alice, bob = make_user(), make_user()
+    ids = [_send(alice, bob) for _ in range(3)]
+    alice_sock, bob_sock = _connect(app, alice), _connect(app, bob)
+
+    bob_sock.emit('mark_delivered', {'sender_id': alice, 'message_id': ids[1]})
+
+    assert _inbox(bob, alice).last_delivered_message_id == ids[1]
+    assert _statuses(ids) == ['delivered', 'delivered', 'sent']
+    receipts = [e['args'][0] for e in alice_sock.get_received() if e['name'] == 'messages_delivered']
+    assert receipts == [{'receiver_id': bob, 'sender_id': alice, 'up_to_id': ids[1]}]
+
+def test_mark_read_recounts_unread(app, make_user):
+    alice, bob = make_user(), make_user()
+    ids = [_send(alice, bob) for _ in range(4)]
+    bob_sock = _connect(app, bob)
+    assert _inbox(bob, alice).unread_count == 4
+
+    bob_sock.emit('mark_read', {'sender_id': alice, 'message_id': ids[1]})
+    conv = _inbox(bob, alice)
+    assert (conv.last_read_message_id, conv.last_delivered_message_id, conv.unread_count) == (ids[1], ids[1], 2)
+    assert _statuses(ids) == ['seen', 'seen', 'sent', 'sent']
+
+    bob_sock.emit('mark_read', {'sender_id': alice})
+    assert _inbox(bob, alice).unread_count == 0
+    assert _statuses(ids) == ['seen'] * 4
+
+def test_receipts_cannot_be_sent_for_another_user(app, make_user):
+    alice, bob, mallory = make_user(), make_user(), make_user()
+    ids = [_send(alice, bob) for _ in range(2)]
+    mallory_sock = _connect(app, mallory)
+
+    # receiver_id in the payload is ignored: the reader is whoever owns the socket
+    mallory_sock.emit('mark_read', {'sender_id': alice, 'receiver_id': bob})
+
+    conv = _inbox(bob, alice)
+    assert (conv.last_read_message_id, conv.unread_count) == (None, 2)
+    assert _statuses(ids) == ['sent', 'sent']
@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+from extensions import socketio
+from routes.auth import _duplicate_error
+from utils import usernames
+
+def _register(client, username, phone):
+    return client.post('/auth/register', json={'username': username, 'phone': phone, 'password': 'pw123456'})
+
+def test_duplicate_username_and_phone_are_reported(client):
+    assert _register(client, 'alice', '+1555').status_code == 201
+
+    taken = _register(client, 'alice', '+1666')
+    assert taken.status_code == 400
+    assert taken.get_json()['error'] == 'Username already taken'
+
+    registered = _register(client, 'bob', '+1555')
+    assert registered.status_code == 400
+    assert registered.get_json()['error'] == 'Phone number already registered'
+
+class _Diag:
+    def __init__(self, constraint_name):
+        self.constraint_name = constraint_name
+
+class _PostgresError(Exception):
+    def __init__(self, message, constraint_name):
+        super().__init__(message)
+        self.diag = _Diag(constraint_name)
+
+def test_username_containing_phone_is_not_a_phone_duplicate():
+    # The Postgres message repeats the value; only the constraint name may decide
+    orig = _PostgresError(
+        'duplicate key value violates unique constraint "user_username_key"\n'
+        'DETAIL:  Key (username)=(iphonefan) already exists.',
+        'user_username_key'
+    )
+    assert _duplicate_error(IntegrityError('INSERT', {}, orig)) == 'Username already taken'
+
+@pytest.fixture
+def no_background_rebuild(monkeypatch):
+    monkeypatch.setattr(usernames, '_ensure_started', lambda: None)
+
+@pytest.mark.parametrize('built', [False, True])
+def test_username_available(app, client, make_user, no_background_rebuild, built):
+    make_user('carol')
+    if built:
+        usernames.rebuild()
+    before = usernames.stats()
+
+    assert client.get('/auth/username-available?username=carol').get_json()['available'] is False
+    assert client.get('/auth/username-available?username=dave').get_json()['available'] is True
+
+    after = usernames.stats()
+    negatives = after['filter_negatives'] - before['filter_negatives']
+    lookups = after['db_lookups'] - before['db_lookups']
+    if built:
+        # The free name is answered by the filter, the taken one by the database
+        assert (negatives, lookups) == (1, 1)
+    else:
+        assert (negatives, lookups) == (0, 2)
+
+def test_registered_name_is_added_to_filter(client, no_background_rebuild):
+    usernames.rebuild()
+    assert _register(client, 'erin', '+1777').status_code == 201
+    assert client.get('/auth/username-available?username=erin').get_json()['available'] is False
+
+def test_name_registered_during_rebuild_is_kept(client, make_user, monkeypatch, no_background_rebuild):
+    make_user('grace')
+    usernames.rebuild()
+    registered = []
+
+    def register_mid_scan(seconds):
+        # Runs after the scan's last chunk, so the new name is not in its snapshot
+        if not registered:
+            registered.append(_register(client, 'frank', '+1888').status_code)
+
+    monkeypatch.setattr(socketio, 'sleep', register_mid_scan)
+    usernames.rebuild()
+
+    assert registered == [201]
+    assert client.get('/auth/username-available?username=frank').get_json()['available'] is False
@@ -0,0 +1,31 @@
+from database.models import Message
+from extensions import socketio
+from utils.token import generate_token
+
+def _connect(app, user_id):
+    return socketio.test_client(app, query_string=f"token={generate_token(user_id)}")
+
+def _events(client, name):
+    return [event for event in client.get_received() if event['name'] == name]
+
+def test_rest_message_only_reaches_participants(app, client, make_user):
+    alice, bob, carol = make_user(), make_user(), make_user()
+    sockets = {uid: _connect(app, uid) for uid in (alice, bob, carol)}
+    for sock in sockets.values():
+        sock.get_received()
+
+    response = client.post('/chat/sendMessage', json={'sender_id': alice, 'receiver_id': bob, 'message': 'hi bob'})
+    assert response.status_code == 201
+
+    assert [e['args'][0]['message'] for e in _events(sockets[bob], 'new_message')] == ['hi bob']
+    assert len(_events(sockets[alice], 'new_message')) == 1 # sender's other devices
+    assert _events(sockets[carol], 'new_message') == []
+
+def test_socket_message_needs_exactly_one_recipient(app, make_user):
+    alice, bob = make_user(), make_user()
+    sock = _connect(app, alice)
+
+    assert sock.emit('send_message', {'message': 'to nobody'}, callback=True) == {'error': 'Missing required fields'}
+    both = {'receiver_id': bob, 'group_id': 1, 'message': 'to everyone'}
+    assert sock.emit('send_message', both, callback=True) == {'error': 'Missing required fields'}
+    assert Message.query.count() == 0
@@ -0,0 +1,28 @@
+import json
+import pytest
+from database.db import db
+from database.models import Message, User
+from utils.serializers import MESSAGE, USER_DETAIL, OrjsonProvider
+
+def test_row_and_object_dumps_match(app, make_user):
+    alice, bob = make_user(), make_user()
+    db.session.add(Message(sender_id=alice, receiver_id=bob, message='hi', media_url='u'))
+    db.session.commit()
+
+    message = Message.query.one()
+    row = MESSAGE.query().one()
+    assert MESSAGE.dump(message) == MESSAGE.dump_row(row)
+    assert MESSAGE.dump(message)['timestamp'] == message.timestamp.isoformat()
+    assert set(MESSAGE.dump(message)) == set(MESSAGE.fields)
+
+def test_missing_dates_serialize_as_null(app, make_user):
+    uid = make_user()
+    User.query.get(uid).last_seen = None
+    db.session.commit()
+    assert USER_DETAIL.dump_row(USER_DETAIL.query().filter(User.id == uid).one())['last_seen'] is None
+
+def test_orjson_provider_round_trips(app):
+    pytest.importorskip('orjson')
+    provider = OrjsonProvider(app)
+    data = {'b': 1, 'a': [1, 'x', None], 2: True}
+    assert json.loads(provider.dumps(data)) == {'b': 1, 'a': [1, 'x', None], '2': True}
@@ -0,0 +1,25 @@
+import json
+import pytest
+from utils.streaming import stream_json_array
+
+@pytest.mark.parametrize('count', [0, 1, 5, 7])
+def test_stream_is_one_json_array_across_chunks(app, count):
+    with app.test_request_context():
+        response = stream_json_array(range(count), lambda chunk: [{'n': n} for n in chunk], chunk_size=3)
+        assert json.loads(response.get_data()) == [{'n': n} for n in range(count)]
+
+def test_empty_chunks_are_skipped(app):
+    with app.test_request_context():
+        response = stream_json_array(range(6), lambda chunk: [{'n': n} for n in chunk if n >= 3], chunk_size=3)
+        assert json.loads(response.get_data()) == [{'n': 3}, {'n': 4}, {'n': 5}]
+
+def test_admin_user_export_streams_every_user(app, client, make_user, auth_headers):
+    admin = make_user(is_admin=True)
+    for _ in range(4):
+        make_user()
+
+    response = client.get('/admin/users', headers=auth_headers(admin))
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert len(json.loads(response.get_data())) == 5
@@ -0,0 +1,34 @@
+import pytest
+
+def _names(response):
+    assert response.status_code == 200
+    return [user['username'] for user in response.get_json()]
+
+@pytest.fixture
+def people(make_user):
+    for name in ('alice', 'Alina', 'malik', 'bob', 'kalinda'):
+        make_user(name)
+
+def test_short_queries_match_prefixes(client, people):
+    assert _names(client.get('/user/search?q=al')) == ['alice', 'Alina']
+
+def test_longer_queries_match_substrings(client, people):
+    assert _names(client.get('/user/search?q=ali')) == ['alice', 'Alina', 'kalinda', 'malik']
+
+def test_phone_numbers_are_searchable(client, make_user):
+    make_user('carol', phone='+15550001')
+    assert _names(client.get('/user/search?q=5550001')) == ['carol']
+
+def test_after_pages_through_results(client, people):
+    first = _names(client.get('/user/search?q=ali&limit=2'))
+    second = _names(client.get(f"/user/search?q=ali&limit=2&after={first[-1]}"))
+    assert first + second == ['alice', 'Alina', 'kalinda', 'malik']
+
+def test_rename_is_visible_despite_the_autocomplete_cache(client, people, make_user):
+    assert _names(client.get('/user/search?q=bo')) == ['bob']
+    uid = make_user('zed')
+    client.post('/user/update', json={'user_id': uid, 'username': 'bobby'})
+    assert _names(client.get('/user/search?q=bo')) == ['bob', 'bobby']
+
+def test_empty_query_returns_nothing(client, people):
+    assert _names(client.get('/user/search?q=')) == []
@@ -0,0 +1,28 @@
+from flask import g, request
+from utils import profile_cache
+from utils.token import verify_token
+
+# Authenticated-principal middleware: the bearer token is verified once per request
+# (through the token cache) and the caller is exposed as g.current_user, a UserProfile.
+
+def init_auth(app):
+    app.before_request(load_current_user)
+
+def bearer_token():
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header.split(" ", 1)[1].strip() or None
+    return None
+
+def load_current_user():
+    g.auth_token = bearer_token()
+    g.current_user = principal_for_token(g.auth_token)
+
+def principal_for_token(token):
+    # Shared with the socket connect handler
+    if not token:
+        return None
+    user_id = verify_token(token)
+    if not user_id:
+        return None
+    return profile_cache.get_profile(user_id)
@@ -33,3 +33,43 @@ def send_push_notification(token, title, body, data=None):
         print('Successfully sent message:', response)
     except Exception as e:
         print('Error sending message:', e)
+
+class FcmTransport:
+    # Multicast transport for the push dispatcher (utils/push.py).
+    # Returns one (token, error) pair per token; error is None on success.
+    # Always prunable. INVALID_ARGUMENT can also mean an oversized payload, so the dispatcher
+    # only prunes on it when the same multicast reached other tokens.
+    INVALID_CODES = {'UNREGISTERED'}
+    TOKEN_ARGUMENT_CODES = {'INVALID_ARGUMENT'}
+    RETRYABLE_CODES = {'UNAVAILABLE', 'INTERNAL', 'QUOTA_EXCEEDED'}
+
+    def send_multicast(self, tokens, title, body, data=None):
+        if not _is_initialized:
+            return [(token, 'not_initialized') for token in tokens]
+
+        message = messaging.MulticastMessage(
+            notification=messaging.Notification(
+                title=title,
+                body=body,
+            ),
+            data=data or {},
+            tokens=list(tokens),
+        )
+        response = messaging.send_each_for_multicast(message)
+        results = []
+        for token, resp in zip(tokens, response.responses):
+            if resp.success:
+                results.append((token, None))
+            else:
+                results.append((token, _error_code(resp.exception)))
+        return results
+
+def _error_code(exception):
+    # UnregisteredError carries the generic NOT_FOUND code; report it by its FCM name
+    if isinstance(exception, messaging.UnregisteredError):
+        return 'UNREGISTERED'
+    if isinstance(exception, messaging.SenderIdMismatchError):
+        return 'SENDER_ID_MISMATCH'
+    if isinstance(exception, messaging.QuotaExceededError):
+        return 'QUOTA_EXCEEDED'
+    return str(getattr(exception, 'code', None) or 'UNKNOWN').upper()
@@ -0,0 +1,105 @@
+import atexit
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import bindparam, update
+from database.db import db
+from database.models import User
+from utils import profile_cache
+
+# Write-behind buffer for presence persistence: user_id -> last_seen.
+# Disconnects only touch this dict; a background task turns it into one batched UPDATE.
+_pending = {}
+_lock = threading.Lock()
+_app = None
+_started = False
+
+_settings = {'interval': 5.0, 'max_pending': 5000}
+_stats = {
+    'flushes': 0,
+    'rows_flushed': 0,
+    'last_flush_size': 0,
+    'last_flush_ms': None,
+    'max_flush_ms': 0.0,
+    'errors': 0
+}
+
+def init_last_seen(app):
+    global _app
+    _app = app
+    _settings['interval'] = app.config.get('LAST_SEEN_FLUSH_INTERVAL', 5.0)
+    _settings['max_pending'] = app.config.get('LAST_SEEN_MAX_PENDING', 5000)
+    atexit.register(flush)
+
+def record_offline(user_id):
+    with _lock:
+        _pending[int(user_id)] = datetime.utcnow()
+        full = len(_pending) >= _settings['max_pending']
+    _ensure_started()
+    if full:
+        # Bounded buffer: flush inline rather than grow without limit
+        flush()
+
+def cancel(user_id):
+    # The user came back before the flush; there is nothing to persist
+    with _lock:
+        _pending.pop(int(user_id), None)
+
+def flush():
+    global _pending
+    with _lock:
+        batch, _pending = _pending, {}
+    if not batch or _app is None:
+        return 0
+
+    started = time.perf_counter()
+    try:
+        with _app.app_context():
+            # Core executemany rather than the ORM bulk UPDATE: a user deleted since they
+            # disconnected matches no row and is skipped, instead of failing the whole batch
+            users = User.__table__
+            db.session.execute(update(users).where(users.c.id == bindparam('uid')), [
+                {'uid': uid, 'status': 'offline', 'last_seen': ts} for uid, ts in batch.items()
+            ])
+            db.session.commit()
+    except Exception as e:
+        _stats['errors'] += 1
+        print(f"Error flushing last seen: {e}")
+        with _lock:
+            # Put the batch back unless a newer update arrived meanwhile
+            for uid, ts in batch.items():
+                _pending.setdefault(uid, ts)
+        return 0
+
+    for uid in batch:
+        profile_cache.invalidate(uid)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    _stats['flushes'] += 1
+    _stats['rows_flushed'] += len(batch)
+    _stats['last_flush_size'] = len(batch)
+    _stats['last_flush_ms'] = round(elapsed_ms, 2)
+    _stats['max_flush_ms'] = max(_stats['max_flush_ms'], round(elapsed_ms, 2))
+    return len(batch)
+
+def _run():
+    from extensions import socketio
+    while True:
+        socketio.sleep(_settings['interval'])
+        flush()
+
+def _ensure_started():
+    global _started
+    if _started:
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    from extensions import socketio
+    socketio.start_background_task(_run)
+
+def stats():
+    result = dict(_stats)
+    result['pending'] = len(_pending)
+    return result
@@ -0,0 +1,17 @@
+from flask import g
+from utils.profile_cache import get_profiles
+
+def load_users(user_ids):
+    # Request-scoped batch loader backed by the process-wide profile cache: ids not seen
+    # yet in this request are resolved together (cache first, then one IN query).
+    # Returns {user_id: UserProfile or None}.
+    loaded = g.setdefault('_loaded_users', {})
+    wanted = {int(uid) for uid in user_ids if uid is not None}
+
+    missing = wanted - loaded.keys()
+    if missing:
+        profiles = get_profiles(missing)
+        for uid in missing:
+            loaded[uid] = profiles.get(uid)
+
+    return {uid: loaded[uid] for uid in wanted}
@@ -0,0 +1,138 @@
+import base64
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from database.db import db
+from database.models import MediaBlob, blob_hash_from_url
+from utils.media_store import THUMBNAIL_SUFFIX, blob_path
+
+# Thumbnails, blur placeholders and video/PDF poster frames, generated after upload so chat
+# bubbles can render from a few KB instead of the original file.
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+_app = None
+_slots = threading.BoundedSemaphore(2)
+_settings = {'thumbnail_size': 320, 'placeholder_size': 16}
+_stats = {'generated': 0, 'skipped': 0, 'failed': 0}
+
+def init_media_previews(app):
+    global _app, _slots
+    _app = app
+    _slots = threading.BoundedSemaphore(app.config.get('MEDIA_PREVIEW_WORKERS', 2))
+    _settings['thumbnail_size'] = app.config.get('MEDIA_THUMBNAIL_SIZE', 320)
+
+def schedule(sha256):
+    # Called after a new blob is stored; the request returns without waiting
+    from extensions import socketio
+    socketio.start_background_task(_generate, sha256)
+
+def _generate(sha256):
+    with _slots:
+        with _app.app_context():
+            blob = MediaBlob.query.get(sha256)
+            if blob is None:
+                return
+            try:
+                # Decoding and resizing are CPU-bound: run them on a native thread so the
+                # event loop keeps serving sockets meanwhile
+                from eventlet import tpool
+                has_thumbnail, placeholder = tpool.execute(_render, blob_path(blob.sha256, blob.ext), blob.ext)
+            except Exception as e:
+                print(f"Preview generation failed for {sha256}: {e}")
+                blob.preview_status = 'failed'
+                _stats['failed'] += 1
+            else:
+                blob.has_thumbnail = has_thumbnail
+                blob.placeholder = placeholder
+                blob.preview_status = 'ready' if has_thumbnail else 'none'
+                _stats['generated' if has_thumbnail else 'skipped'] += 1
+            db.session.commit()
+
+def _render(source, ext):
+    # Returns (has_thumbnail, placeholder data URL or None)
+    try:
+        from PIL import Image
+    except ImportError:
+        return False, None
+
+    if ext in IMAGE_EXTENSIONS:
+        frame = source
+    elif ext == 'mp4':
+        frame = _extract_frame(['ffmpeg', '-y', '-loglevel', 'error', '-ss', '1', '-i', source, '-frames:v', '1'])
+    elif ext == 'pdf':
+        frame = _extract_frame(['pdftoppm', '-jpeg', '-singlefile', '-f', '1', '-l', '1', source], appends_extension=True)
+    else:
+        return False, None
+
+    if frame is None:
+        return False, None
+
+    try:
+        with Image.open(frame) as image:
+            image = image.convert('RGB')
+            size = _settings['thumbnail_size']
+            image.thumbnail((size, size))
+            image.save(source + THUMBNAIL_SUFFIX, 'JPEG', quality=75, optimize=True)
+
+            tiny = image.copy()
+            tiny.thumbnail((_settings['placeholder_size'], _settings['placeholder_size']))
+            buf = io.BytesIO()
+            tiny.save(buf, 'JPEG', quality=50)
+            placeholder = 'data:image/jpeg;base64,' + base64.b64encode(buf.getvalue()).decode()
+        return True, placeholder
+    finally:
+        if frame != source and os.path.exists(frame):
+            os.remove(frame)
+
+def _extract_frame(command, appends_extension=False):
+    # Poster frames come from external tools when installed (ffmpeg, poppler's pdftoppm)
+    if shutil.which(command[0]) is None:
+        return None
+    fd, output = tempfile.mkstemp(suffix='.jpg')
+    os.close(fd)
+    # ffmpeg takes the full output file name; pdftoppm appends '.jpg' to the prefix it's given
+    target = output[:-len('.jpg')] if appends_extension else output
+    try:
+        subprocess.run(command + [target], check=True, timeout=30, capture_output=True)
+    except (subprocess.SubprocessError, OSError):
+        if os.path.exists(output):
+            os.remove(output)
+        return None
+    return output
+
+def previews_for_urls(urls):
+    # {media_url: {'thumbnail_url', 'placeholder'}} for every url with a ready preview; one query
+    by_hash = {}
+    for url in urls:
+        sha = blob_hash_from_url(url)
+        if sha:
+            by_hash.setdefault(sha, []).append(url)
+    if not by_hash:
+        return {}
+
+    result = {}
+    blobs = db.session.query(MediaBlob.sha256, MediaBlob.has_thumbnail, MediaBlob.placeholder).filter(
+        MediaBlob.sha256.in_(by_hash.keys())
+    )
+    for sha, has_thumbnail, placeholder in blobs:
+        for url in by_hash[sha]:
+            result[url] = {
+                'thumbnail_url': url + THUMBNAIL_SUFFIX if has_thumbnail else None,
+                'placeholder': placeholder
+            }
+    return result
+
+def attach_previews(items):
+    # Adds thumbnail_url / placeholder to serialized messages that carry media
+    previews = previews_for_urls(item['media_url'] for item in items if item.get('media_url'))
+    for item in items:
+        preview = previews.get(item.get('media_url'))
+        item['thumbnail_url'] = preview['thumbnail_url'] if preview else None
+        item['placeholder'] = preview['placeholder'] if preview else None
+    return items
+
+def stats():
+    return dict(_stats)
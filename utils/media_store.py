@@ -0,0 +1,137 @@
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from database.db import db
+from database.models import MediaBlob, UploadSession
+
+# Content-addressed media storage: identical bytes are stored once, whatever the filename
+BUFFER_SIZE = 64 * 1024
+THUMBNAIL_SUFFIX = '.thumb.jpg' # written next to the original by utils/media_previews.py
+
+def upload_root():
+    root = os.path.join(current_app.root_path, 'static', 'uploads')
+    os.makedirs(root, exist_ok=True)
+    return root
+
+def blob_name(sha256, ext):
+    # Sharded so no directory grows past a few thousand entries
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}.{ext}"
+
+def blob_path(sha256, ext):
+    return os.path.join(upload_root(), sha256[:2], sha256[2:4], f"{sha256}.{ext}")
+
+def _partial_folder():
+    folder = os.path.join(current_app.instance_path, 'uploads_tmp')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+def partial_path(upload_id):
+    # Bytes of a resumable upload in progress
+    return os.path.join(_partial_folder(), f"{upload_id}.part")
+
+def find_blob(sha256):
+    # Returns the MediaBlob if its bytes are actually on disk
+    blob = MediaBlob.query.get(sha256)
+    if blob and os.path.exists(blob_path(blob.sha256, blob.ext)):
+        return blob
+    return None
+
+def store_stream(stream, ext):
+    # Hashes while writing to a temp file, then keeps the existing copy if the content is known
+    tmp_dir = os.path.join(upload_root(), 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            while True:
+                buf = stream.read(BUFFER_SIZE)
+                if not buf:
+                    break
+                digest.update(buf)
+                f.write(buf)
+                size += len(buf)
+        return _commit_blob(tmp_path, digest.hexdigest(), ext, size)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def store_file(path, ext):
+    # Same as store_stream for a file already on disk (e.g. a finished resumable upload)
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            buf = f.read(BUFFER_SIZE)
+            if not buf:
+                break
+            digest.update(buf)
+            size += len(buf)
+    try:
+        return _commit_blob(path, digest.hexdigest(), ext, size)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+def _commit_blob(tmp_path, sha256, ext, size):
+    blob = MediaBlob.query.get(sha256)
+    if blob and os.path.exists(blob_path(sha256, blob.ext)):
+        # Already stored: the new copy is dropped, costing zero additional bytes
+        return blob, False
+
+    # A known row whose file went missing keeps its recorded extension
+    target = blob_path(sha256, blob.ext if blob else ext)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(tmp_path, target)
+
+    if blob is None:
+        try:
+            blob = MediaBlob(sha256=sha256, ext=ext, size=size, ref_count=0)
+            db.session.add(blob)
+            db.session.commit()
+        except IntegrityError:
+            # Same content finished uploading concurrently
+            db.session.rollback()
+            blob = MediaBlob.query.get(sha256)
+    return blob, True
+
+def collect_garbage(grace_hours=24):
+    # Removes blobs no message references once they are older than the grace period,
+    # which leaves time for an upload to be attached to a message
+    cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+    blobs = MediaBlob.query.filter(MediaBlob.ref_count <= 0, MediaBlob.created_at < cutoff).all()
+    for blob in blobs:
+        path = blob_path(blob.sha256, blob.ext)
+        # The generated thumbnail sits next to the original and goes with it
+        for stale in (path, path + THUMBNAIL_SUFFIX):
+            if os.path.exists(stale):
+                os.remove(stale)
+        db.session.delete(blob)
+    db.session.commit()
+    return len(blobs)
+
+def expire_uploads(max_age_hours=24):
+    # Drops resumable uploads that were started before the cutoff and never completed
+    cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+    sessions = UploadSession.query.filter(UploadSession.created_at < cutoff).all()
+    for session in sessions:
+        path = partial_path(session.id)
+        if os.path.exists(path):
+            os.remove(path)
+        db.session.delete(session)
+    db.session.commit()
+
+    # .part files whose session row never got committed
+    live = {upload_id for (upload_id,) in db.session.query(UploadSession.id)}
+    folder = _partial_folder()
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name.endswith('.part') and name[:-len('.part')] not in live \
+                and datetime.utcfromtimestamp(os.path.getmtime(path)) < cutoff:
+            os.remove(path)
+    return len(sessions)
@@ -0,0 +1,35 @@
+from flask import request
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+def _int_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an integer")
+
+def get_page_args(default_limit=DEFAULT_LIMIT, max_limit=MAX_LIMIT):
+    # Reads ?before_id=&after_id=&limit= from the query string
+    before_id = _int_arg('before_id')
+    after_id = _int_arg('after_id')
+    limit = _int_arg('limit') or default_limit
+
+    if before_id is not None and after_id is not None:
+        raise ValueError("Use either 'before_id' or 'after_id', not both")
+
+    return before_id, after_id, max(1, min(limit, max_limit))
+
+def keyset_page(query, id_column, before_id=None, after_id=None, limit=DEFAULT_LIMIT):
+    # Returns one page in ascending id order; without a cursor this is the newest page
+    if after_id is not None:
+        return query.filter(id_column > after_id).order_by(id_column.asc()).limit(limit).all()
+
+    if before_id is not None:
+        query = query.filter(id_column < before_id)
+    rows = query.order_by(id_column.desc()).limit(limit).all()
+    rows.reverse()
+    return rows
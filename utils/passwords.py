@@ -0,0 +1,43 @@
+import threading
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Password hashing is deliberately slow. Running it inline would freeze every socket on the
+# eventlet worker, so it is sent to eventlet's native thread pool (hashlib releases the GIL),
+# with a cap on concurrent hashes so a login burst queues briefly and then gets a 503.
+
+class PasswordHasherBusy(Exception):
+    pass
+
+_slots = threading.BoundedSemaphore(4)
+_settings = {'method': None, 'queue_timeout': 5.0}
+_stats = {'hashed': 0, 'checked': 0, 'rejected': 0}
+
+def init_passwords(app):
+    global _slots
+    _slots = threading.BoundedSemaphore(app.config.get('PASSWORD_HASH_CONCURRENCY', 4))
+    _settings['method'] = app.config.get('PASSWORD_HASH_METHOD')
+    _settings['queue_timeout'] = app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5.0)
+
+def _offload(fn, *args, **kwargs):
+    if not _slots.acquire(timeout=_settings['queue_timeout']):
+        _stats['rejected'] += 1
+        raise PasswordHasherBusy()
+    try:
+        from eventlet import tpool
+        return tpool.execute(fn, *args, **kwargs)
+    finally:
+        _slots.release()
+
+def hash_password(password):
+    kwargs = {'method': _settings['method']} if _settings['method'] else {}
+    result = _offload(generate_password_hash, password, **kwargs)
+    _stats['hashed'] += 1
+    return result
+
+def check_password(pwhash, password):
+    result = _offload(check_password_hash, pwhash, password)
+    _stats['checked'] += 1
+    return result
+
+def stats():
+    return dict(_stats)
@@ -0,0 +1,165 @@
+import threading
+import uuid
+
+class LocalPresence:
+    # In-process registry; only correct with a single worker (and for tests).
+    # user_id -> set of sids and sid -> user_id, so every operation is O(1).
+    def __init__(self):
+        self._sids_by_user = {}
+        self._user_by_sid = {}
+        self._lock = threading.Lock()
+
+    def connect(self, user_id, sid):
+        # Returns True when this is the user's first live session
+        with self._lock:
+            self._user_by_sid[sid] = user_id
+            sids = self._sids_by_user.setdefault(user_id, set())
+            sids.add(sid)
+            return len(sids) == 1
+
+    def disconnect(self, sid):
+        # Returns (user_id, went_offline); user_id is None for unknown sids
+        with self._lock:
+            user_id = self._user_by_sid.pop(sid, None)
+            if user_id is None:
+                return None, False
+            sids = self._sids_by_user.get(user_id)
+            if sids is not None:
+                sids.discard(sid)
+                if sids:
+                    return user_id, False
+                del self._sids_by_user[user_id]
+            return user_id, True
+
+    def user_for(self, sid):
+        return self._user_by_sid.get(sid)
+
+    def sids_for(self, user_id):
+        return set(self._sids_by_user.get(user_id, ()))
+
+    def is_online(self, user_id):
+        return user_id in self._sids_by_user
+
+    def online_among(self, user_ids):
+        return {uid for uid in user_ids if uid in self._sids_by_user}
+
+class RedisPresence:
+    # Shared between workers so any of them can tell who is connected. Each worker also keeps
+    # the set of sids it owns and a heartbeat key with a TTL; when a worker dies without running
+    # its disconnect handlers, the others purge its sids once the heartbeat expires.
+    def __init__(self, client, prefix='presence:', worker_ttl=60):
+        self.client = client
+        self.prefix = prefix
+        self.sids_key = f"{prefix}sids"
+        self.workers_key = f"{prefix}workers"
+        self.worker_id = uuid.uuid4().hex
+        self.worker_ttl = worker_ttl
+        self._started = False
+        self._lock = threading.Lock()
+
+    def _user_key(self, user_id):
+        return f"{self.prefix}user:{user_id}"
+
+    def _worker_key(self, worker_id):
+        return f"{self.prefix}worker:{worker_id}"
+
+    def _alive_key(self, worker_id):
+        return f"{self.prefix}alive:{worker_id}"
+
+    def connect(self, user_id, sid):
+        self._ensure_heartbeat()
+        pipe = self.client.pipeline()
+        pipe.hset(self.sids_key, sid, user_id)
+        pipe.sadd(self._worker_key(self.worker_id), sid)
+        pipe.sadd(self._user_key(user_id), sid)
+        pipe.scard(self._user_key(user_id))
+        return pipe.execute()[-1] == 1
+
+    def disconnect(self, sid):
+        user_id = self.client.hget(self.sids_key, sid)
+        if user_id is None:
+            return None, False
+        user_id = int(user_id)
+        pipe = self.client.pipeline()
+        pipe.hdel(self.sids_key, sid)
+        pipe.srem(self._worker_key(self.worker_id), sid)
+        pipe.srem(self._user_key(user_id), sid)
+        pipe.scard(self._user_key(user_id))
+        return user_id, pipe.execute()[-1] == 0
+
+    def user_for(self, sid):
+        user_id = self.client.hget(self.sids_key, sid)
+        return int(user_id) if user_id is not None else None
+
+    def sids_for(self, user_id):
+        return {sid.decode() for sid in self.client.smembers(self._user_key(user_id))}
+
+    def is_online(self, user_id):
+        return self.client.exists(self._user_key(user_id)) == 1
+
+    def online_among(self, user_ids):
+        user_ids = list(user_ids)
+        pipe = self.client.pipeline()
+        for uid in user_ids:
+            pipe.exists(self._user_key(uid))
+        return {uid for uid, online in zip(user_ids, pipe.execute()) if online}
+
+    def heartbeat(self):
+        pipe = self.client.pipeline()
+        pipe.sadd(self.workers_key, self.worker_id)
+        pipe.set(self._alive_key(self.worker_id), 1, ex=self.worker_ttl)
+        pipe.execute()
+        return self.purge_dead_workers()
+
+    def purge_dead_workers(self):
+        # Removes the sids of workers whose heartbeat expired (crashed or restarted).
+        # Returns the number of sids removed.
+        purged = 0
+        for worker_id in self.client.smembers(self.workers_key):
+            worker_id = worker_id.decode()
+            if worker_id == self.worker_id or self.client.exists(self._alive_key(worker_id)):
+                continue
+            sids = list(self.client.smembers(self._worker_key(worker_id)))
+            user_ids = self.client.hmget(self.sids_key, sids) if sids else []
+            pipe = self.client.pipeline()
+            for sid, user_id in zip(sids, user_ids):
+                pipe.hdel(self.sids_key, sid)
+                if user_id is not None:
+                    pipe.srem(self._user_key(int(user_id)), sid)
+            pipe.delete(self._worker_key(worker_id))
+            pipe.srem(self.workers_key, worker_id)
+            pipe.execute()
+            purged += len(sids)
+        return purged
+
+    def _run_heartbeat(self):
+        from extensions import socketio
+        while True:
+            try:
+                self.heartbeat()
+            except Exception as e:
+                print(f"Presence heartbeat failed: {e}")
+            socketio.sleep(self.worker_ttl / 3)
+
+    def _ensure_heartbeat(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        from extensions import socketio
+        socketio.start_background_task(self._run_heartbeat)
+
+presence = LocalPresence()
+
+def init_presence(app):
+    global presence
+    if app.config.get('REDIS_URL'):
+        from utils.redis_client import get_redis
+        presence = RedisPresence(get_redis(app.config['REDIS_URL']), worker_ttl=app.config.get('PRESENCE_WORKER_TTL', 60))
+    else:
+        presence = LocalPresence()
+
+def get_presence():
+    return presence
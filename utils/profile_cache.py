@@ -0,0 +1,129 @@
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from database.db import db
+from database.models import User
+
+# Compact, immutable view of the User fields needed to render senders, inboxes and call logs
+UserProfile = namedtuple('UserProfile', ['id', 'username', 'profile_picture', 'status', 'is_admin'])
+
+class LocalProfileBackend:
+    # Per-process LRU with a TTL on every entry
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, user_ids):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for uid in user_ids:
+                entry = self._entries.get(uid)
+                if entry is None:
+                    continue
+                expires_at, profile = entry
+                if expires_at < now:
+                    del self._entries[uid]
+                    continue
+                self._entries.move_to_end(uid)
+                found[uid] = profile
+        return found
+
+    def set_many(self, profiles):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for uid, profile in profiles.items():
+                self._entries[uid] = (expires_at, profile)
+                self._entries.move_to_end(uid)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+class RedisProfileBackend:
+    # Shared between gunicorn workers, so an invalidation in one is seen by all
+    def __init__(self, client, ttl=300, prefix='profile:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get_many(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        values = self.client.mget([f"{self.prefix}{uid}" for uid in user_ids])
+        return {uid: UserProfile(*json.loads(value)) for uid, value in zip(user_ids, values) if value is not None}
+
+    def set_many(self, profiles):
+        pipe = self.client.pipeline()
+        for uid, profile in profiles.items():
+            pipe.setex(f"{self.prefix}{uid}", self.ttl, json.dumps(list(profile)))
+        pipe.execute()
+
+    def delete(self, user_id):
+        self.client.delete(f"{self.prefix}{user_id}")
+
+_backend = LocalProfileBackend()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+def init_profile_cache(app):
+    global _backend
+    ttl = app.config.get('PROFILE_CACHE_TTL', 300)
+    if app.config.get('REDIS_URL'):
+        from utils.redis_client import get_redis
+        _backend = RedisProfileBackend(get_redis(app.config['REDIS_URL']), ttl=ttl)
+    else:
+        _backend = LocalProfileBackend(maxsize=app.config.get('PROFILE_CACHE_SIZE', 10000), ttl=ttl)
+
+def set_backend(backend):
+    # Any object with get_many/set_many/delete can be plugged in
+    global _backend
+    _backend = backend
+
+def get_profiles(user_ids):
+    # Returns {user_id: UserProfile}; ids that don't exist are left out
+    wanted = {int(uid) for uid in user_ids if uid is not None}
+    if not wanted:
+        return {}
+
+    found = _backend.get_many(wanted)
+    missing = wanted - found.keys()
+    _stats['hits'] += len(found)
+    _stats['misses'] += len(missing)
+
+    if missing:
+        rows = db.session.query(
+            User.id, User.username, User.profile_picture, User.status, User.is_admin
+        ).filter(User.id.in_(missing)).all()
+        loaded = {row.id: UserProfile(*row) for row in rows}
+        if loaded:
+            _backend.set_many(loaded)
+        found.update(loaded)
+
+    return found
+
+def get_profile(user_id):
+    if user_id is None:
+        return None
+    return get_profiles([user_id]).get(int(user_id))
+
+def invalidate(user_id):
+    _backend.delete(int(user_id))
+    _stats['invalidations'] += 1
+
+def stats():
+    lookups = _stats['hits'] + _stats['misses']
+    result = dict(_stats)
+    result['hit_ratio'] = round(_stats['hits'] / lookups, 4) if lookups else None
+    result['backend'] = type(_backend).__name__
+    if isinstance(_backend, LocalProfileBackend):
+        result['size'] = len(_backend)
+    return result
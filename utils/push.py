@@ -0,0 +1,212 @@
+import threading
+import time
+from collections import defaultdict
+
+# Push notification dispatcher. Message handlers call notify() for recipients that aren't
+# connected; a background task coalesces bursts from the same chat into one notification per
+# user, groups identical notifications into multicast batches, and retries with backoff.
+
+class FakeTransport:
+    # Local stand-in for tests and development: records every multicast instead of sending
+    INVALID_CODES = {'UNREGISTERED'}
+    TOKEN_ARGUMENT_CODES = {'INVALID_ARGUMENT'}
+    RETRYABLE_CODES = {'UNAVAILABLE'}
+
+    def __init__(self, failures=None):
+        self.sent = []
+        self.failures = failures or {} # token -> error code to report
+
+    def send_multicast(self, tokens, title, body, data=None):
+        self.sent.append({'tokens': list(tokens), 'title': title, 'body': body, 'data': dict(data or {})})
+        return [(token, self.failures.get(token)) for token in tokens]
+
+class NullTransport:
+    INVALID_CODES = set()
+    TOKEN_ARGUMENT_CODES = set()
+    RETRYABLE_CODES = set()
+
+    def send_multicast(self, tokens, title, body, data=None):
+        return [(token, 'disabled') for token in tokens]
+
+_transport = NullTransport()
+_pending = {} # (user_id, chat_key) -> coalesced notification
+_retries = [] # batches waiting for their next attempt
+_lock = threading.Lock()
+_started = False
+_app = None
+
+_settings = {'coalesce': 2.0, 'interval': 0.5, 'batch_size': 500, 'max_retries': 5, 'retry_base': 1.0, 'body_length': 240}
+_stats = {'queued': 0, 'coalesced': 0, 'batches': 0, 'delivered': 0, 'failed': 0, 'retried': 0, 'invalid_tokens': 0}
+
+# Hooks, filled in by the device token registry
+_token_resolver = lambda user_ids: {}
+_invalid_token_handler = lambda tokens: None
+
+def init_push(app):
+    global _app, _transport
+    _app = app
+    _settings['coalesce'] = app.config.get('PUSH_COALESCE_SECONDS', 2.0)
+    _settings['batch_size'] = app.config.get('PUSH_BATCH_SIZE', 500)
+    _settings['max_retries'] = app.config.get('PUSH_MAX_RETRIES', 5)
+    _settings['retry_base'] = app.config.get('PUSH_RETRY_BASE_SECONDS', 1.0)
+    _settings['body_length'] = app.config.get('PUSH_BODY_MAX_LENGTH', 240)
+
+    transport = app.config.get('PUSH_TRANSPORT', 'fcm')
+    if transport == 'fake':
+        _transport = FakeTransport()
+    elif transport == 'fcm':
+        try:
+            from utils.fcm import FcmTransport, init_fcm
+            init_fcm()
+            _transport = FcmTransport()
+        except ImportError as e:
+            print(f"FCM transport unavailable: {e}")
+            _transport = NullTransport()
+    else:
+        _transport = NullTransport()
+
+def set_transport(transport):
+    global _transport
+    _transport = transport
+
+def get_transport():
+    return _transport
+
+def set_token_resolver(resolver):
+    # resolver(user_ids) -> {user_id: [tokens]}
+    global _token_resolver
+    _token_resolver = resolver
+
+def set_invalid_token_handler(handler):
+    # handler(tokens) is called with tokens the transport reported as invalid
+    global _invalid_token_handler
+    _invalid_token_handler = handler
+
+def _truncate(text):
+    # FCM rejects payloads over 4KB; a notification only needs a preview of the message
+    limit = _settings['body_length']
+    text = text or ''
+    return text if len(text) <= limit else text[:limit - 1] + '\u2026'
+
+def notify(user_ids, title, body, chat_key, data=None):
+    now = time.monotonic()
+    title, body = _truncate(title), _truncate(body)
+    with _lock:
+        for user_id in user_ids:
+            key = (int(user_id), chat_key)
+            entry = _pending.get(key)
+            if entry is None:
+                _pending[key] = {
+                    'user_id': int(user_id), 'title': title, 'body': body, 'count': 1,
+                    'data': dict(data or {}, chat_key=chat_key), 'due_at': now + _settings['coalesce']
+                }
+                _stats['queued'] += 1
+            else:
+                # Same chat within the window: one notification summarising the burst
+                entry['count'] += 1
+                entry['title'] = title
+                entry['body'] = f"{entry['count']} new messages"
+                entry['data'] = dict(data or {}, chat_key=chat_key)
+                _stats['coalesced'] += 1
+    _ensure_started()
+
+def _take_due(now):
+    with _lock:
+        due_keys = [key for key, entry in _pending.items() if entry['due_at'] <= now]
+        notifications = [_pending.pop(key) for key in due_keys]
+        due_retries = [batch for batch in _retries if batch['due_at'] <= now]
+        _retries[:] = [batch for batch in _retries if batch['due_at'] > now]
+    return notifications, due_retries
+
+def dispatch(now=None):
+    # One pass of the worker; also callable directly from tests
+    now = time.monotonic() if now is None else now
+    notifications, due_retries = _take_due(now)
+
+    if notifications:
+        tokens_by_user = _token_resolver({n['user_id'] for n in notifications})
+        # Identical content (e.g. one group message to many offline members) shares a multicast
+        groups = defaultdict(list)
+        for n in notifications:
+            content = (n['title'], n['body'], tuple(sorted((k, str(v)) for k, v in n['data'].items())))
+            groups[content].extend(tokens_by_user.get(n['user_id'], []))
+
+        size = _settings['batch_size']
+        for (title, body, data), tokens in groups.items():
+            for start in range(0, len(tokens), size):
+                _send({'tokens': tokens[start:start + size], 'title': title, 'body': body,
+                       'data': dict(data), 'attempt': 0})
+
+    for batch in due_retries:
+        _send(batch)
+
+def _send(batch):
+    _stats['batches'] += 1
+    try:
+        results = _transport.send_multicast(batch['tokens'], batch['title'], batch['body'], batch['data'])
+    except Exception as e:
+        print(f"Push send failed: {e}")
+        _schedule_retry(batch, batch['tokens'])
+        return
+
+    # A per-token INVALID_ARGUMENT only means a bad token when the same payload reached other
+    # tokens; if nothing got through, the payload itself may be the problem, so nothing is pruned
+    payload_ok = any(error is None for _, error in results)
+    invalid, retry = [], []
+    for token, error in results:
+        if error is None:
+            _stats['delivered'] += 1
+        elif error in _transport.INVALID_CODES or (payload_ok and error in _transport.TOKEN_ARGUMENT_CODES):
+            invalid.append(token)
+        elif error in _transport.RETRYABLE_CODES:
+            retry.append(token)
+        else:
+            _stats['failed'] += 1
+
+    if invalid:
+        _stats['invalid_tokens'] += len(invalid)
+        _invalid_token_handler(invalid)
+    if retry:
+        _schedule_retry(batch, retry)
+
+def _schedule_retry(batch, tokens):
+    attempt = batch['attempt'] + 1
+    if attempt > _settings['max_retries']:
+        _stats['failed'] += len(tokens)
+        return
+    _stats['retried'] += len(tokens)
+    retry = dict(batch, tokens=list(tokens), attempt=attempt,
+                 due_at=time.monotonic() + _settings['retry_base'] * (2 ** (attempt - 1)))
+    with _lock:
+        _retries.append(retry)
+
+def _run():
+    from extensions import socketio
+    while True:
+        socketio.sleep(_settings['interval'])
+        try:
+            if _app is not None:
+                with _app.app_context():
+                    dispatch()
+            else:
+                dispatch()
+        except Exception as e:
+            print(f"Push dispatcher error: {e}")
+
+def _ensure_started():
+    global _started
+    if _started:
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    from extensions import socketio
+    socketio.start_background_task(_run)
+
+def stats():
+    result = dict(_stats)
+    result['pending'] = len(_pending)
+    result['retrying'] = len(_retries)
+    result['transport'] = type(_transport).__name__
+    return result
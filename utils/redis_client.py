@@ -0,0 +1,8 @@
+_clients = {}
+
+def get_redis(url):
+    # redis is optional: only imported when a shared backend is configured
+    if url not in _clients:
+        import redis
+        _clients[url] = redis.Redis.from_url(url)
+    return _clients[url]
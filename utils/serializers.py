@@ -0,0 +1,70 @@
+from flask.json.provider import DefaultJSONProvider
+from database.db import db
+from database.models import User, Message
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+class ModelSerializer:
+    # Builds the dict for one API shape of a model. The dump functions are generated once
+    # as flat dict literals, and `query()` selects only the needed columns, so list
+    # endpoints can serialize plain row tuples without hydrating ORM objects.
+    def __init__(self, model, *fields, dates=()):
+        self.fields = fields
+        self.columns = [getattr(model, name) for name in fields]
+        self.dump_row = self._compile('row', [
+            f"_iso(row[{i}])" if name in dates else f"row[{i}]" for i, name in enumerate(fields)
+        ])
+        self.dump = self._compile('obj', [
+            f"_iso(obj.{name})" if name in dates else f"obj.{name}" for name in fields
+        ])
+
+    def _compile(self, arg, exprs):
+        body = ', '.join(f"{name!r}: {expr}" for name, expr in zip(self.fields, exprs))
+        namespace = {'_iso': _iso}
+        exec(f"def dump({arg}):\n    return {{{body}}}\n", namespace)
+        return namespace['dump']
+
+    def query(self):
+        return db.session.query(*self.columns)
+
+    def dump_rows(self, rows):
+        dump_row = self.dump_row
+        return [dump_row(row) for row in rows]
+
+# Returned with the auth token on register/login
+USER_AUTH = ModelSerializer(User, 'id', 'username', 'phone', 'profile_picture', 'is_admin')
+# Profile view and admin listing
+USER_DETAIL = ModelSerializer(User, 'id', 'username', 'phone', 'profile_picture', 'status', 'last_seen', 'is_admin', dates=('last_seen',))
+# Search results
+USER_SUMMARY = ModelSerializer(User, 'id', 'username', 'phone', 'profile_picture', 'status', 'is_admin')
+
+# 1-on-1 history and new_message events
+MESSAGE = ModelSerializer(Message, 'id', 'sender_id', 'receiver_id', 'message', 'timestamp', 'message_type', 'media_url', 'status', dates=('timestamp',))
+# Group history; sender_name is added by the caller
+GROUP_MESSAGE = ModelSerializer(Message, 'id', 'sender_id', 'message', 'timestamp', 'message_type', dates=('timestamp',))
+# Message search hits; database/search.py selects these columns in this order
+MESSAGE_SEARCH = ModelSerializer(Message, 'id', 'sender_id', 'receiver_id', 'group_id', 'message', 'message_type', 'timestamp', dates=('timestamp',))
+
+class OrjsonProvider(DefaultJSONProvider):
+    # Drop-in JSON backend for jsonify and streamed responses, enabled with JSON_BACKEND=orjson
+    def dumps(self, obj, **kwargs):
+        import orjson
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        import orjson
+        return orjson.loads(s)
+
+def init_json(app):
+    if app.config.get('JSON_BACKEND') != 'orjson':
+        return
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        print("orjson not installed, using the default JSON backend")
+        return
+    app.json = OrjsonProvider(app)
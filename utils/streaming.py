@@ -0,0 +1,25 @@
+from itertools import islice
+from flask import Response, current_app, stream_with_context
+
+DEFAULT_CHUNK_SIZE = 1000
+
+def stream_json_array(rows, serialize_chunk, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Writes a JSON array incrementally so memory stays flat however many rows there are.
+    # rows is any iterable (typically query.yield_per(chunk_size)); serialize_chunk turns a
+    # list of rows into a list of dicts, which lets it batch lookups such as load_users.
+    def generate():
+        dumps = current_app.json.dumps
+        iterator = iter(rows)
+        first = True
+        yield '['
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            body = ','.join(dumps(item) for item in serialize_chunk(chunk))
+            if body:
+                yield body if first else ',' + body
+                first = False
+        yield ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
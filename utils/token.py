@@ -1,18 +1,62 @@
 import jwt
 import datetime
-import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from config.config import Config
+
+# Signing key is resolved once (from Config, overridden by init_tokens) instead of per call
+_secret = Config.SECRET_KEY
+
+# Verified tokens: sha256(token) -> (exp, payload). Entries never outlive the token's own exp.
+_verified = OrderedDict()
+_lock = threading.Lock()
+_settings = {'max_entries': 10000}
+_stats = {'hits': 0, 'misses': 0}
+
+def init_tokens(app):
+    global _secret
+    _secret = app.config['SECRET_KEY']
+    _settings['max_entries'] = app.config.get('TOKEN_CACHE_SIZE', 10000)
+    with _lock:
+        _verified.clear()
 
 def generate_token(user_id):
     payload = {
         'user_id': user_id,
         'exp': datetime.datetime.utcnow() + datetime.timedelta(days=7)
     }
-    return jwt.encode(payload, os.environ.get('SECRET_KEY') or 'you-will-never-guess', algorithm='HS256')
+    return jwt.encode(payload, _secret, algorithm='HS256')
+
+def _decode(token):
+    # Returns the payload, or raises jwt.InvalidTokenError (incl. ExpiredSignatureError)
+    key = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+    with _lock:
+        entry = _verified.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                _verified.move_to_end(key)
+                _stats['hits'] += 1
+                return entry[1]
+            del _verified[key]
+
+    _stats['misses'] += 1
+    payload = jwt.decode(token, _secret, algorithms=['HS256'])
+    exp = payload.get('exp', now)
+    with _lock:
+        _verified[key] = (exp, payload)
+        while len(_verified) > _settings['max_entries']:
+            _verified.popitem(last=False)
+    return payload
+
+def user_id_from_payload(payload):
+    return payload.get('user_id', payload.get('sub'))
 
 def verify_token(token):
     try:
-        payload = jwt.decode(token, os.environ.get('SECRET_KEY') or 'you-will-never-guess', algorithms=['HS256'])
-        return payload['user_id']
+        return user_id_from_payload(_decode(token))
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
@@ -20,6 +64,11 @@ def verify_token(token):
 
 def decode_token(token):
     try:
-        return jwt.decode(token, os.environ.get('SECRET_KEY') or 'you-will-never-guess', algorithms=['HS256'])
+        return _decode(token)
     except Exception:
         raise Exception("Invalid Token")
+
+def stats():
+    result = dict(_stats)
+    result['size'] = len(_verified)
+    return result
@@ -0,0 +1,93 @@
+import threading
+from sqlalchemy import select
+from database.db import db
+from database.models import User
+from utils.bloom import BloomFilter
+
+# Negative-lookup cache for the sign-up "is this username free?" check. Most typed names are
+# free, and a Bloom filter miss proves it without touching the database; a hit falls back to
+# a real lookup. Rebuilt periodically in the background so names taken on other workers show up.
+
+_filter = None
+_added_during_rebuild = None # names remembered while a rebuild scans, replayed before the swap
+_app = None
+_started = False
+_lock = threading.Lock()
+_settings = {'capacity': 1000000, 'error_rate': 0.01, 'refresh': 300}
+_stats = {'filter_negatives': 0, 'db_lookups': 0, 'rebuilds': 0, 'errors': 0}
+
+def init_usernames(app):
+    global _app
+    _app = app
+    _settings['capacity'] = app.config.get('USERNAME_FILTER_CAPACITY', 1000000)
+    _settings['error_rate'] = app.config.get('USERNAME_FILTER_ERROR_RATE', 0.01)
+    _settings['refresh'] = app.config.get('USERNAME_FILTER_REFRESH', 300)
+
+def rebuild():
+    # Full scan of usernames; runs on the background task, never inside a request
+    global _filter, _added_during_rebuild
+    from extensions import socketio
+    rebuilt = BloomFilter(max(_settings['capacity'], 1), _settings['error_rate'])
+    with _lock:
+        _added_during_rebuild = []
+    try:
+        with _app.app_context():
+            rows = db.session.execute(select(User.username).execution_options(yield_per=10000))
+            for partition in rows.partitions():
+                for (username,) in partition:
+                    rebuilt.add(username)
+                socketio.sleep(0) # let sockets run between chunks
+    except Exception:
+        with _lock:
+            _added_during_rebuild = None
+        raise
+    with _lock:
+        # Names registered after the scan started may be missing from its snapshot
+        for username in _added_during_rebuild:
+            rebuilt.add(username)
+        _added_during_rebuild = None
+        _filter = rebuilt
+    _stats['rebuilds'] += 1
+
+def _run():
+    from extensions import socketio
+    while True:
+        try:
+            rebuild()
+        except Exception as e:
+            _stats['errors'] += 1
+            print(f"Error rebuilding username filter: {e}")
+        socketio.sleep(_settings['refresh'])
+
+def _ensure_started():
+    global _started
+    if _started or _app is None:
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    from extensions import socketio
+    socketio.start_background_task(_run)
+
+def is_username_available(username):
+    _ensure_started()
+    # Until the first build finishes every check goes to the database
+    current = _filter
+    if current is not None and username not in current:
+        _stats['filter_negatives'] += 1
+        return True
+    _stats['db_lookups'] += 1
+    return db.session.query(User.id).filter(User.username == username).first() is None
+
+def remember_username(username):
+    with _lock:
+        if _filter is not None:
+            _filter.add(username)
+        if _added_during_rebuild is not None:
+            _added_during_rebuild.append(username)
+
+def stats():
+    result = dict(_stats)
+    result['entries'] = _filter.count if _filter is not None else 0
+    return result